@@ -0,0 +1,322 @@
+"""
+Autoplay and replay mode of the Tk front end.
+
+Moves, from the built-in solver or from a recorded game, run at engine speed in short slices
+scheduled between Tk events, so the window stays responsive. Instead of repainting a square on
+every change, the squares changed by the moves are collected and painted once per frame, at a
+target frame rate. A control window sets the speed and pauses or steps the game.
+
+    python autoplay.py
+    python autoplay.py --height 50 --width 50 --bombs 400 --seed 3 --record game.jsonl
+    python autoplay.py --replay game.jsonl
+
+Recorded games are JSON lines: a "new" line with the board and seed, then one line per move
+with the op ("reveal", "flag" or "chord") and the i, j location, as sent to the game server.
+"""
+import argparse
+import json
+import random
+import time
+import tkinter as tk
+from typing import Iterator, Optional
+
+from constants import DEFAULT_AUTOPLAY_FPS, AUTOPLAY_MOVE_BUDGET_MS
+from controller import Controller
+from headless import DirtyView
+from model import Model
+from solver import Solver
+from stats import StatsStore
+from utils import Difficulty, colorpicker, str_to_difficulty_enum
+from view import View
+
+
+class FrameView(DirtyView):
+    """
+    View coalescing the updates of the Controller into frames.
+    Updates only mark squares as dirty, flush() paints their final state on the Tk View.
+    """
+
+    def __init__(self, model: Model, view: View) -> None:
+        """
+        :param model: Model of the game
+        :param view: Tk View painted by flush
+        """
+        super().__init__(model)
+        self.view = view
+
+    def set_cbox_value(self, value) -> None:
+        self.view.set_cbox_value(value)
+
+    def rebuild_board(self) -> None:
+        self.view.rebuild_board()
+
+    def flush(self) -> int:
+        """
+        Paint the squares changed since the last frame
+
+        :return: Number of squares painted
+        """
+        height = self.model.get_height()
+        width = self.model.get_width()
+        if not self.view.board_complete or len(self.view.board) != height or len(self.view.board[0]) != width:
+            # Board is being rebuilt, it is painted once complete
+            return 0
+        squares = self.pop_dirty()
+        for (i, j) in squares:
+            self.paint(i, j)
+        return len(squares)
+
+    def paint(self, i: int, j: int) -> None:
+        """
+        Paint the current state of the (i, j) square
+
+        :param i: Height location of the cell
+        :param j: Width location of the cell
+        """
+        cell = self.model.grid.board[i][j]
+        if (i, j) in self.bombs_shown:
+            if cell.is_revealed:
+                self.view.set_clicked(i, j)
+            self.view.set_bomb(i, j)
+        elif cell.is_revealed:
+            self.view.set_disabled(i, j)
+            self.view.set_clicked(i, j)
+            text = str(cell.bombs_around) if cell.bombs_around else ""
+            self.view.set_bomb_text(i, j, text, colorpicker(cell.bombs_around))
+        else:
+            self.view.set_unclicked(i, j)
+            if cell.is_flagged:
+                self.view.set_flag(i, j)
+
+
+class AutoplayController(Controller):
+    """ Controller painting through a FrameView, game over dialogs are replaced by a status """
+
+    def __init__(self, model: Model, view: View, stats: Optional[StatsStore] = None) -> None:
+        super().__init__(model, FrameView(model, view), stats)
+        self.game_over = False
+        self.message = "Playing"
+        # Autoplayer of the game, its run ends when another game is started
+        self.player = None
+
+    def win_game(self) -> None:
+        self.record_game(won=True)
+        self.game_over = True
+        self.message = "Won"
+
+    def lose_game(self) -> None:
+        self.record_game(won=False)
+        self.reveal_all_bombs()
+        self.game_over = True
+        self.message = "Lost"
+
+    def start_new_game(self, seed: Optional[int] = None) -> None:
+        if self.player is not None:
+            # The moves and the record are of the previous game
+            self.player.stop()
+            self.player = None
+        super().start_new_game(seed)
+        self.game_over = False
+        self.message = "Playing"
+
+    def undo_state(self) -> None:
+        if self.model.undo_state():
+            self.view.board_to_state(self.model.get_state())
+            self.game_over = False
+            self.message = "Playing"
+
+    def play(self, op: str, i: int, j: int) -> None:
+        """
+        Play a move
+
+        :param op: "reveal", "flag" or "chord"
+        :param i: Height location of the cell
+        :param j: Width location of the cell
+        """
+        if op == 'reveal':
+            self.left_handler(i, j)
+        elif op == 'flag':
+            self.right_handler(i, j)
+        elif op == 'chord':
+            self.chord_handler(i, j)
+        else:
+            raise ValueError(f'unknown op {op!r}')
+
+
+def read_game(path: str) -> tuple[dict, list[tuple[str, int, int]]]:
+    """
+    Read a recorded game
+
+    :param path: Path of the JSON lines file
+    :return: Tuple of the "new" request and the list of (op, i, j) moves
+    """
+    new = None
+    moves = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            if request.get('op') == 'new':
+                new = request
+            else:
+                moves.append((request['op'], request['i'], request['j']))
+    if new is None:
+        raise ValueError(f"{path} has no 'new' line")
+    return new, moves
+
+
+class Autoplayer:
+    """ Runs moves in time slices between Tk events, and paints frames at a target frame rate """
+
+    def __init__(self, view: View, controller: AutoplayController, moves: Iterator[tuple[str, int, int]],
+                 fps: int = DEFAULT_AUTOPLAY_FPS, record: Optional[list] = None) -> None:
+        """
+        :param view: Tk View of the game
+        :param controller: Controller playing the moves
+        :param moves: Moves to play
+        :param fps: Frames painted per second
+        :param record: List to append the played moves to
+        """
+        self.view = view
+        self.controller = controller
+        self.moves = moves
+        self.fps = fps
+        self.record = record
+        self.speed = 10.0
+        self.paused = False
+        self.finished = False
+        self.moves_played = 0
+        self.frames = 0
+        self._due = 0.0
+        self._last_tick = time.perf_counter()
+        self._tick_scheduled = False
+
+    def start(self) -> None:
+        """ Start the move and frame schedules """
+        self.controller.player = self
+        self._last_tick = time.perf_counter()
+        self._schedule_tick()
+        self.view.window.after(1000 // self.fps, self._frame)
+
+    def stop(self) -> None:
+        """ End the run, no more moves are played """
+        self.finished = True
+
+    def set_speed(self, moves_per_second: float) -> None:
+        self.speed = moves_per_second
+
+    def toggle_pause(self) -> bool:
+        """
+        Pause or resume
+
+        :return: True if paused
+        """
+        self.paused = not self.paused
+        self._due = 0.0
+        if not self.paused:
+            self._last_tick = time.perf_counter()
+            self._schedule_tick()
+        return self.paused
+
+    def step(self) -> None:
+        """ Play a single move and paint it at once, meant for when paused """
+        self.play_next()
+        self._paint()
+
+    def play_next(self) -> bool:
+        """
+        Play the next move
+
+        :return: False once there are no moves left
+        """
+        if self.finished:
+            return False
+        try:
+            op, i, j = next(self.moves)
+        except StopIteration:
+            self.finished = True
+            return False
+        self.controller.play(op, i, j)
+        self.moves_played += 1
+        if self.record is not None:
+            self.record.append({'op': op, 'i': i, 'j': j})
+        return True
+
+    def _schedule_tick(self) -> None:
+        """ Schedule the next slice of moves, unless paused, finished or already scheduled """
+        if not self.paused and not self.finished and not self._tick_scheduled:
+            self._tick_scheduled = True
+            self.view.window.after(1, self._tick)
+
+    def _tick(self) -> None:
+        self._tick_scheduled = False
+        if self.paused or self.finished:
+            return
+        now = time.perf_counter()
+        self._due = min(self._due + (now - self._last_tick) * self.speed, self.speed)
+        # Moves run for a bounded slice, so input and frames are handled in between
+        deadline = now + AUTOPLAY_MOVE_BUDGET_MS / 1000
+        while self._due >= 1 and time.perf_counter() < deadline:
+            if not self.play_next():
+                self._due = 0.0
+                break
+            self._due -= 1
+        self._last_tick = now
+        self._schedule_tick()
+
+    def _frame(self) -> None:
+        self._paint()
+        self.view.window.after(1000 // self.fps, self._frame)
+
+    def _paint(self) -> None:
+        if self.controller.view.flush():
+            self.frames += 1
+
+    def get_status(self) -> str:
+        state = "finished" if self.finished else "paused" if self.paused else "playing"
+        return f"{self.controller.message} - {self.moves_played} moves, {self.frames} frames - {state}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Watch the solver or a recorded game play")
+    parser.add_argument('--replay', help="Recorded game to play, the solver plays if not given")
+    parser.add_argument('--record', help="Path to record the played game to")
+    parser.add_argument('--height', type=int, default=30)
+    parser.add_argument('--width', type=int, default=30)
+    parser.add_argument('--bombs', type=int, default=150)
+    parser.add_argument('--seed', type=int, help="Seed of the bombs layout and of the solver guesses")
+    parser.add_argument('--fps', type=int, default=DEFAULT_AUTOPLAY_FPS)
+    args = parser.parse_args()
+
+    if args.replay:
+        new, replay_moves = read_game(args.replay)
+        difficulty = str_to_difficulty_enum(new.get('difficulty', Difficulty.CUSTOM.value))
+        argv = (new['height'], new['width'], new['bombs']) if difficulty == Difficulty.CUSTOM else ()
+        seed = new['seed']
+    else:
+        difficulty, argv = Difficulty.CUSTOM, (args.height, args.width, args.bombs)
+        seed = args.seed if args.seed is not None else random.randrange(2 ** 63)
+
+    from main import create_game
+    record = [] if args.record else None
+    new_game = {}
+
+    def _on_ready() -> None:
+        controller.load_game(difficulty, *argv, seed=seed)
+        model = controller.model
+        # Board of the recorded moves, kept even if another game is started from the window
+        new_game.update({'op': 'new', 'difficulty': model.difficulty.value, 'height': model.get_height(),
+                         'width': model.get_width(), 'bombs': model.get_bombs(), 'seed': seed})
+        moves = iter(replay_moves) if args.replay else Solver(seed).moves(controller)
+        player = Autoplayer(view, controller, moves, args.fps, record)
+        view.create_autoplay_controls(player)
+        player.start()
+
+    view, controller = create_game(controller_class=AutoplayController, on_ready=_on_ready)
+    tk.mainloop()
+    if args.record:
+        with open(args.record, 'w') as f:
+            f.write(json.dumps(new_game) + '\n')
+            for move in record:
+                f.write(json.dumps(move) + '\n')
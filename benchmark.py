@@ -0,0 +1,484 @@
+"""
+Reproducible benchmarks of the engine, undo and rendering paths.
+
+Every benchmark runs on fixed seeds over presets from Easy up to a 1000x1000 custom board.
+Rendering benchmarks need a display, Xvfb is started when there is none. Results are written
+as JSON and compared against a stored baseline, benchmarks which can't be checked against it
+fail the run like regressions:
+
+    python benchmark.py --output bench.json
+    python benchmark.py --save-baseline
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import sys
+import time
+from typing import Any, Callable, Optional
+
+from constants import (BENCHMARK_MAX_BATCH, BENCHMARK_MAX_BATCH_CELLS, BENCHMARK_MIN_TIMING_S, DEFAULT_BENCHMARK_BASELINE,
+                       DEFAULT_BENCHMARK_NOISE_FLOOR_MS, DEFAULT_BENCHMARK_THRESHOLD)
+from generation import generate_layout
+from grid import Grid
+from model import Model
+from utils import Difficulty
+
+# Seed of every bombs layout used by the benchmarks
+SEED = 20240501
+
+# Benchmark presets as name: (height, width, bombs)
+PRESETS = {
+    'easy': (8, 10, 10),
+    'medium': (14, 18, 40),
+    'hard': (20, 24, 99),
+    'custom-50': (50, 50, 500),
+    'custom-200': (200, 200, 8000),
+    'custom-1000': (1000, 1000, 200000),
+}
+
+# Largest board the GUI lets a player create
+MAX_VIEW_CELLS = 50 * 50
+# Largest board of the memory reports, the solver analysis of every move is cached
+MAX_MEMORY_CELLS = 200 * 200
+
+
+def new_model(height: int, width: int, bombs: int) -> Model:
+    """ Create a model holding a seeded game """
+    model = Model()
+    model.set_parameters(Difficulty.CUSTOM, height, width, bombs)
+    model.new_game(SEED)
+    return model
+
+
+def new_session(height: int, width: int, bombs: int):
+    """ Create a seeded headless session, driving the real Controller """
+    from server import HeadlessView, SessionController
+    model = new_model(height, width, bombs)
+    view = HeadlessView(model)
+    controller = SessionController(model, view)
+    view.set_controller(controller)
+    return controller
+
+
+def find_opening(grid: Grid) -> tuple[int, int]:
+    """ Return the first square with no bombs around it, the start of a flood fill """
+    for line in grid.board:
+        for cell in line:
+            if not cell.is_bomb and cell.bombs_around == 0:
+                return cell.x, cell.y
+    return 0, 0
+
+
+def reveal_some(model: Model, fraction: float = 0.5, start: float = 0.0) -> None:
+    """ Reveal and flag the squares from start to fraction of the board, so states are not trivially empty """
+    cells = [cell for line in model.grid.board for cell in line]
+    for cell in cells[int(len(cells) * start):int(len(cells) * fraction)]:
+        if cell.is_bomb:
+            model.grid.set_flagged(cell.x, cell.y, True)
+            model.set_bombs_left(model.get_bombs_left() - 1)
+        else:
+            model.grid.reveal(cell.x, cell.y)
+            model.set_squares_revealed(model.get_squares_revealed() + 1)
+
+
+# Engine benchmarks ############################################################
+# Every benchmark is a pair of functions: setup(height, width, bombs) creates the state
+# of a single run outside of the measured time, run(state) is the measured part.
+
+def _setup_none(height: int, width: int, bombs: int) -> tuple[int, int, int]:
+    return height, width, bombs
+
+
+def _run_grid_construction(args: tuple[int, int, int]) -> None:
+    height, width, bombs = args
+    Grid(width, height, bombs, SEED)
+
+
+def _setup_add_bombs(height: int, width: int, bombs: int) -> Grid:
+    grid = Grid(width, height, bombs, SEED)
+    grid.reset()
+    return grid
+
+
+def _run_add_bombs(grid: Grid) -> None:
+    grid.add_bombs(SEED)
+
+
+def _run_generate_layout(args: tuple[int, int, int]) -> None:
+    height, width, bombs = args
+    generate_layout(height, width, bombs, SEED, workers=1)
+
+
+def _run_generate_layout_parallel(args: tuple[int, int, int]) -> None:
+    height, width, bombs = args
+    generate_layout(height, width, bombs, SEED)
+
+
+def _setup_grid(height: int, width: int, bombs: int) -> Grid:
+    return new_model(height, width, bombs).grid
+
+
+def _run_get_neighbours(grid: Grid) -> None:
+    for i in range(grid.height):
+        for j in range(grid.width):
+            grid.get_neighbours(i, j)
+
+
+def _setup_flood_fill(height: int, width: int, bombs: int):
+    controller = new_session(height, width, bombs)
+    return controller, find_opening(controller.model.grid)
+
+
+def _run_flood_fill(args) -> None:
+    controller, (i, j) = args
+    controller.left_handler(i, j)
+
+
+def _setup_played_model(height: int, width: int, bombs: int) -> Model:
+    model = new_model(height, width, bombs)
+    reveal_some(model)
+    return model
+
+
+def _run_save_state(model: Model) -> None:
+    model.save_state()
+
+
+def _setup_undo_state(height: int, width: int, bombs: int) -> Model:
+    model = _setup_played_model(height, width, bombs)
+    model.save_state()
+    # A tenth of the board changes after the snapshot, for the undo to restore
+    reveal_some(model, 0.6, 0.5)
+    return model
+
+
+def _run_undo_state(model: Model) -> None:
+    model.undo_state()
+
+
+def _setup_played_grid(height: int, width: int, bombs: int) -> Grid:
+    return _setup_played_model(height, width, bombs).grid
+
+
+def _run_get_state(grid: Grid) -> None:
+    grid.get_state()
+
+
+def _setup_set_state(height: int, width: int, bombs: int):
+    model = _setup_played_model(height, width, bombs)
+    state = model.grid.get_state()
+    reveal_some(model, 0.6, 0.5)
+    return model.grid, state
+
+
+def _run_set_state(args) -> None:
+    grid, state = args
+    grid.set_state(state)
+
+
+# Benchmarks as name: (setup, run, largest board in cells or None)
+ENGINE_BENCHMARKS = {
+    'grid_construction': (_setup_none, _run_grid_construction, None),
+    'grid_add_bombs': (_setup_add_bombs, _run_add_bombs, None),
+    'generate_layout': (_setup_none, _run_generate_layout, None),
+    'generate_layout_parallel': (_setup_none, _run_generate_layout_parallel, None),
+    'grid_get_neighbours': (_setup_grid, _run_get_neighbours, None),
+    'controller_flood_fill': (_setup_flood_fill, _run_flood_fill, None),
+    'model_save_state': (_setup_played_model, _run_save_state, None),
+    'model_undo_state': (_setup_undo_state, _run_undo_state, None),
+    'grid_get_state': (_setup_played_grid, _run_get_state, None),
+    'grid_set_state': (_setup_set_state, _run_set_state, None),
+}
+
+
+# Rendering benchmarks #########################################################
+
+class ViewBench:
+    """ Real View and Controller on a hidden window, for the rendering benchmarks """
+
+    def __init__(self, height: int, width: int, bombs: int) -> None:
+        import tkinter as tk
+        from controller import Controller
+        from view import View
+        self.model = new_model(height, width, bombs)
+        self.view = View()
+        self.controller = Controller(self.model, self.view)
+        self.view.set_controller(self.controller)
+        self.view.window = tk.Tk()
+        self.view.window.withdraw()
+        self.view.create_images()
+        self.state = None
+
+    def flush(self) -> None:
+        """ Let Tk process the pending drawing """
+        self.view.window.update()
+
+    def destroy(self) -> None:
+        self.view.window.destroy()
+
+
+def _run_create_board(bench: ViewBench) -> None:
+    bench.view.create_board(bench.view.window)
+    bench.flush()
+
+
+def _setup_view_board(height: int, width: int, bombs: int) -> ViewBench:
+    bench = ViewBench(height, width, bombs)
+    bench.view.create_board(bench.view.window)
+    bench.flush()
+    return bench
+
+
+def _run_reset_board(bench: ViewBench) -> None:
+    bench.view.reset_board(bench.model.get_height(), bench.model.get_width())
+    bench.flush()
+
+
+def _setup_board_to_state(height: int, width: int, bombs: int) -> ViewBench:
+    bench = _setup_view_board(height, width, bombs)
+    reveal_some(bench.model)
+    bench.state = bench.model.grid.get_state()
+    return bench
+
+
+def _run_board_to_state(bench: ViewBench) -> None:
+    bench.view.board_to_state(bench.state)
+    bench.flush()
+
+
+VIEW_BENCHMARKS = {
+    'view_create_board': (ViewBench, _run_create_board, MAX_VIEW_CELLS),
+    'view_reset_board': (_setup_view_board, _run_reset_board, MAX_VIEW_CELLS),
+    'view_board_to_state': (_setup_board_to_state, _run_board_to_state, MAX_VIEW_CELLS),
+}
+
+
+# Runner #######################################################################
+
+def repeat_count(cells: int) -> int:
+    """ Number of measured runs of a benchmark, fewer on large boards """
+    if cells <= 2500:
+        return 20
+    if cells <= 40000:
+        return 5
+    return 3
+
+
+def _time_batch(setup: Callable, run: Callable, preset: tuple[int, int, int], batch: int) -> float:
+    """ Time a batch of runs, each on its own fresh setup, and return the time of one run """
+    states = [setup(*preset) for _ in range(batch)]
+    # As in timeit, collections triggered by the states of the batch are not part of the timing
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for state in states:
+            run(state)
+        elapsed = time.perf_counter() - start
+    finally:
+        gc.enable()
+    for state in states:
+        if isinstance(state, ViewBench):
+            state.destroy()
+    return elapsed / batch
+
+
+def measure(setup: Callable, run: Callable, preset: tuple[int, int, int], repeat: int) -> dict[str, Any]:
+    """
+    Measure a benchmark, with a fresh setup before every run.
+    A first run calibrates the batch: engine runs faster than BENCHMARK_MIN_TIMING_S are timed
+    several at a time, as far as the boards of a batch fit in BENCHMARK_MAX_BATCH_CELLS, so a timing
+    is not down to the resolution of the clock.
+
+    :param setup: Function creating the state of a run
+    :param run: Measured function
+    :param preset: height, width, bombs of the board
+    :param repeat: Number of measured timings
+    :return: Dictionary of min, median and max run times in seconds, and of the batch size
+    """
+    first = _time_batch(setup, run, preset, 1)
+    batch = 1
+    if setup not in (ViewBench, _setup_view_board, _setup_board_to_state) and first < BENCHMARK_MIN_TIMING_S:
+        batch = max(1, min(BENCHMARK_MAX_BATCH, BENCHMARK_MAX_BATCH_CELLS // (preset[0] * preset[1]),
+                           math.ceil(BENCHMARK_MIN_TIMING_S / max(first, 1e-7))))
+    times = [_time_batch(setup, run, preset, batch) for _ in range(repeat)]
+    return {'min_s': min(times), 'median_s': statistics.median(times), 'max_s': max(times), 'repeat': repeat,
+            'batch': batch}
+
+
+def has_display() -> bool:
+    """ Checks whether a Tk window can be opened """
+    try:
+        import tkinter as tk
+        tk.Tk().destroy()
+    except Exception:
+        return False
+    return True
+
+
+def run_benchmarks(presets: list[str], name_filter: Optional[str] = None, with_view: bool = True,
+                   log: Callable[[str], None] = print) -> dict[str, Any]:
+    """
+    Run every benchmark on every preset
+
+    :param presets: Names of the presets to run
+    :param name_filter: Only run benchmarks whose name contains this string
+    :param with_view: Whether to run the rendering benchmarks
+    :param log: Function called with a line for every result
+    :return: Dictionary of the results keyed by benchmark/preset, of the benchmarks skipped as the board
+        is too large for them, and of the benchmarks which couldn't run without a display
+    """
+    benchmarks = dict(ENGINE_BENCHMARKS, **VIEW_BENCHMARKS)
+    results = {}
+    skipped = []
+    unavailable = []
+    for name, (setup, run, max_cells) in benchmarks.items():
+        if name_filter and name_filter not in name:
+            continue
+        for preset_name in presets:
+            key = f'{name}/{preset_name}'
+            height, width, bombs = PRESETS[preset_name]
+            if max_cells is not None and height * width > max_cells:
+                skipped.append(key)
+                continue
+            if name in VIEW_BENCHMARKS and not with_view:
+                unavailable.append(key)
+                continue
+            results[key] = measure(setup, run, PRESETS[preset_name], repeat_count(height * width))
+            log(f"{key:<40}{results[key]['min_s'] * 1000:>12.3f} ms")
+    return {'results': results, 'skipped': skipped, 'unavailable': unavailable}
+
+
+def run_memory_reports(presets: list[str], with_view: bool = True,
+                       log: Callable[[str], None] = print) -> dict[str, Any]:
+    """
+    Measure the memory of a played session on every preset
+
+    :param presets: Names of the presets to run
+    :param with_view: Whether to measure the Tk board
+    :param log: Function called with a line for every result
+    :return: Dictionary of the memory reports keyed by preset
+    """
+    from memory_report import measure_memory
+    reports = {}
+    for preset_name in presets:
+        height, width, bombs = PRESETS[preset_name]
+        if height * width > MAX_MEMORY_CELLS:
+            continue
+        reports[preset_name] = measure_memory(height, width, bombs, with_view=with_view)
+        log(f"{'memory/' + preset_name:<40}{reports[preset_name]['total'] / 1024:>12.1f} KiB")
+    return reports
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], threshold: float,
+            noise_floor_ms: float = DEFAULT_BENCHMARK_NOISE_FLOOR_MS) -> list[str]:
+    """
+    Compare results against a baseline, on the fastest run of every benchmark,
+    and on the bytes of every subsystem of the memory reports
+
+    :param results: Results of run_benchmarks
+    :param baseline: Results of a previous run
+    :param threshold: Allowed slowdown, 0.25 allows runs to be 25% slower
+    :param noise_floor_ms: Slowdowns smaller than this, in milliseconds, are not regressions
+    :return: List of regression descriptions, empty if there are none
+    """
+    regressions = []
+    for key, result in results['results'].items():
+        base = baseline['results'].get(key)
+        if base is None or base['min_s'] <= 0:
+            continue
+        ratio = result['min_s'] / base['min_s']
+        if ratio > 1 + threshold and (result['min_s'] - base['min_s']) * 1000 > noise_floor_ms:
+            regressions.append(f"{key}: {base['min_s'] * 1000:.3f} ms -> {result['min_s'] * 1000:.3f} ms "
+                               f"({(ratio - 1) * 100:+.0f}%)")
+    if results.get('memory') and baseline.get('memory'):
+        from memory_report import compare_memory
+        for preset_name, report in results['memory'].items():
+            if preset_name in baseline['memory']:
+                regressions.extend(compare_memory(report, baseline['memory'][preset_name], threshold,
+                                                  f'memory/{preset_name}/'))
+    return regressions
+
+
+def unchecked(results: dict[str, Any], baseline: dict[str, Any]) -> list[str]:
+    """
+    Return the benchmarks compare can't check: results and memory reports which the baseline has
+    no result for, and baseline results of benchmarks which couldn't run
+
+    :param results: Results of run_benchmarks
+    :param baseline: Results of a previous run
+    :return: List of benchmark/preset keys
+    """
+    return ([key for key in results['results'] if key not in baseline['results']]
+            + [f'memory/{preset_name}' for preset_name in results.get('memory', {})
+               if preset_name not in baseline.get('memory', {})]
+            + [key for key in results.get('unavailable', []) if key in baseline['results']])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Minesweeper benchmarks")
+    parser.add_argument('--presets', nargs='+', choices=list(PRESETS), default=list(PRESETS))
+    parser.add_argument('--filter', help="Only run benchmarks whose name contains this string")
+    parser.add_argument('--output', help="Path to write the results to as JSON")
+    parser.add_argument('--baseline', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                       DEFAULT_BENCHMARK_BASELINE),
+                        help="Results to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_BENCHMARK_THRESHOLD,
+                        help="Allowed slowdown against the baseline, 0.25 is 25%%")
+    parser.add_argument('--noise-floor-ms', type=float, default=DEFAULT_BENCHMARK_NOISE_FLOOR_MS,
+                        help="Slowdowns smaller than this are noise, not regressions")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="Don't report the memory of every subsystem, on boards up to %d cells" % MAX_MEMORY_CELLS)
+    args = parser.parse_args()
+
+    xvfb = None
+    if not has_display() and shutil.which('Xvfb') is not None:
+        from gui_loadtest import start_xvfb
+        xvfb = start_xvfb()
+    try:
+        with_view = has_display()
+        if not with_view:
+            print("No display and Xvfb isn't installed, the rendering benchmarks can't run")
+        # Memory reports are part of every run, so they are in the baseline and compared like the timings.
+        # They run first, so what the benchmarks leave allocated doesn't change them
+        memory = None
+        if not args.no_memory and (not args.filter or args.filter in 'memory'):
+            memory = run_memory_reports(args.presets, with_view)
+        results = run_benchmarks(args.presets, args.filter, with_view)
+        if memory is not None:
+            results['memory'] = memory
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+    results['meta'] = {'seed': SEED, 'python': sys.version.split()[0], 'platform': platform.platform(),
+                       'machine': platform.machine(), 'time': time.time(), 'display': with_view}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, nothing to compare against")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.noise_floor_ms)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    missing = unchecked(results, baseline)
+    for key in missing:
+        print(f"UNCHECKED {key}: " + ("couldn't run" if key in results['unavailable'] else "not in the baseline"))
+    return 1 if regressions or missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
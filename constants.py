@@ -1,2 +1,60 @@
 # Default start value of undo tries
 DEFAULT_UNDO_TRIES = 3
+
+# Server: total number of cells kept in memory before idle sessions are evicted to disk
+DEFAULT_MAX_RESIDENT_CELLS = 2_000_000
+# Server: requests read ahead from a connection before reading is paused
+DEFAULT_MAX_PENDING_REQUESTS = 32
+# Server: directory of evicted session snapshots
+DEFAULT_SNAPSHOT_DIR = "sessions"
+# Server: largest board, in cells, a session may be created with
+DEFAULT_MAX_SESSION_CELLS = 100_000
+
+# Statistics: database file of recorded games
+DEFAULT_STATS_PATH = "stats.db"
+# Statistics: results buffered by the GUI before they are written
+DEFAULT_STATS_BATCH_SIZE = 16
+# Statistics: results written per transaction on bulk ingestion
+DEFAULT_STATS_INGEST_CHUNK = 50_000
+
+# Instrumentation: environment variable holding the path to dump profiling data to, enables it when set
+PROFILE_ENV_VAR = "MINESWEEPER_PROFILE"
+
+# Benchmarks: stored results to compare new runs against
+DEFAULT_BENCHMARK_BASELINE = "benchmark_baseline.json"
+# Benchmarks: allowed slowdown against the baseline before a run fails
+DEFAULT_BENCHMARK_THRESHOLD = 0.25
+# Benchmarks: slowdowns smaller than this, in milliseconds, are timer and scheduling noise and never fail a run
+DEFAULT_BENCHMARK_NOISE_FLOOR_MS = 0.5
+# Benchmarks: shortest measured time, runs faster than this are batched in a single timing
+BENCHMARK_MIN_TIMING_S = 0.01
+# Benchmarks: largest number of runs batched in a single timing
+BENCHMARK_MAX_BATCH = 200
+# Benchmarks: largest number of squares of the boards set up for a single timing
+BENCHMARK_MAX_BATCH_CELLS = 1_000_000
+
+# View: squares created per step when the board is built progressively
+BOARD_SQUARES_PER_STEP = 200
+
+# Analysis: number of positions kept in a transposition cache
+DEFAULT_TRANSPOSITION_CACHE_SIZE = 100_000
+
+# GUI load test: budget of the 99th percentile of input to paint latency, in milliseconds
+DEFAULT_LATENCY_BUDGET_MS = 100
+# GUI load test: budget of the longest event loop stall, in milliseconds
+DEFAULT_STALL_BUDGET_MS = 250
+
+# Squares of a band of rows in parallel layout generation
+DEFAULT_GENERATION_BAND_CELLS = 1 << 20
+# Boards of this many squares and more are mined by bands of rows, see generation.py
+DEFAULT_LAYOUT_GENERATION_CELLS = 10_000
+
+# Autoplay: frames painted per second
+DEFAULT_AUTOPLAY_FPS = 30
+# Autoplay: time given to moves between two Tk events, in milliseconds
+AUTOPLAY_MOVE_BUDGET_MS = 8
+# Autoplay: the speed slider goes from 1 to 10 ** AUTOPLAY_MAX_SPEED_EXPONENT moves per second
+AUTOPLAY_MAX_SPEED_EXPONENT = 5
+
+# Memory report: moves played before measuring
+DEFAULT_MEMORY_REPORT_MOVES = 100
@@ -1,16 +1,26 @@
-import tkinter.simpledialog as tksmpl
-import tkinter.dialog as tkdiag
 import sys
+import time
+from typing import Optional, TYPE_CHECKING
+
 from model import Model
-from view import View
+from stats import StatsStore, result_from_model
 import utils
 
+if TYPE_CHECKING:
+    from view import View
+
 
 class Controller:
 
-    def __init__(self, model: Model, view: View) -> None:
+    def __init__(self, model: Model, view: 'View', stats: Optional[StatsStore] = None) -> None:
+        """
+        :param model: Model of the game
+        :param view: View showing the game
+        :param stats: Store to record finished games in, games are not recorded if not given
+        """
         self.model = model
         self.view = view
+        self.stats = stats
 
     def left_handler(self, i: int, j: int, to_save_state: bool = True) -> None:
         """
@@ -22,24 +32,63 @@ class Controller:
         """
         if to_save_state:
             self.model.save_state()
-        if self.view.is_empty_image(i, j) and not self.model.grid.board[i][j].is_revealed:
-            self.view.set_clicked(i, j)
-            is_bomb, bombs_around = self.model.grid.board[i][j].reveal()
-            if is_bomb:
-                self.view.set_bomb(i, j)
-                self.lose_game()
-            else:
+            self.model.add_click()
+        self.reveal_squares([(i, j)])
+
+    def chord_handler(self, i: int, j: int) -> bool:
+        """
+        Called when middle click, or left click, on the revealed (i, j) cell.
+        When as many neighbours are flagged as there are bombs around, all other hidden
+        neighbours and their openings are revealed as a single move, with one undo snapshot.
+
+        :param i: Height location of the cell
+        :param j: Width location of the cell
+        :return: True if the chord was played
+        """
+        grid = self.model.grid
+        cell = grid.board[i][j]
+        if not cell.is_revealed or cell.bombs_around == 0:
+            return False
+        neighbours = [grid.board[x][y] for (x, y) in grid.get_neighbours(i, j) if (x, y) != (i, j)]
+        if sum(neighbour.is_flagged for neighbour in neighbours) != cell.bombs_around:
+            return False
+        hidden = [(neighbour.x, neighbour.y) for neighbour in neighbours
+                  if not neighbour.is_revealed and not neighbour.is_flagged]
+        if not hidden:
+            return False
+        self.model.save_state()
+        self.model.add_click()
+        self.reveal_squares(hidden)
+        return True
+
+    def reveal_squares(self, squares: list[tuple[int, int]]) -> None:
+        """
+        Reveal squares and the openings they lead to, as part of a single move
+
+        :param squares: List of (i, j) locations to reveal
+        """
+        # Openings push their neighbours instead of recursing, so large boards can't exceed the recursion limit
+        pending = list(reversed(squares))
+        while pending:
+            i, j = pending.pop()
+            if self.view.is_empty_image(i, j) and not self.model.grid.board[i][j].is_revealed:
+                self.view.set_clicked(i, j)
+                is_bomb, bombs_around = self.model.grid.reveal(i, j)
+                if is_bomb:
+                    self.view.set_bomb(i, j)
+                    self.lose_game()
+                    return
                 self.model.set_squares_revealed(self.model.get_squares_revealed() + 1)
                 if bombs_around != 0:
                     color = utils.colorpicker(bombs_around)
                     text = str(bombs_around)
                     self.view.set_bomb_text(i, j, text, color)
                 else:
-                    for (x, y) in self.model.get_grid().get_neighbours(i, j):
-                        self.left_handler(x, y, False)
+                    pending.extend(self.model.get_grid().get_neighbours(i, j))
                 if self.model.get_squares_revealed() == (
                         self.model.get_width() * self.model.get_height() - self.model.get_bombs()):
                     self.win_game()
+                    return
 
     def right_handler(self, i: int, j: int) -> None:
         """
@@ -48,20 +97,24 @@ class Controller:
         :param i: Height location of the cell
         :param j: Width location of the cell
         """
+        self.model.add_click()
         if not self.model.is_square_revealed(i, j):
             if self.view.is_empty_image(i, j):
                 if self.model.set_bombs_left(self.model.get_bombs_left() - 1):
                     self.view.set_flag(i, j)
-                    self.model.grid.board[i][j].is_flagged = True
+                    self.model.grid.set_flagged(i, j, True)
             else:
                 if self.model.set_bombs_left(self.model.get_bombs_left() + 1):
                     self.view.set_disabled(i, j)
-                    self.model.grid.board[i][j].is_flagged = False
+                    self.model.grid.set_flagged(i, j, False)
 
     def win_game(self) -> None:
         """
         Called when win game logic occurred
         """
+        self.record_game(won=True)
+        # Dialog modules are only needed once a game ends, they aren't imported at startup
+        import tkinter.dialog as tkdiag
         title = "You won!"
         msg = "Good job. Play again?"
         strings = ('New Game', 'Quit')
@@ -77,19 +130,25 @@ class Controller:
         Called when lose game logic occurred
         """
         self.reveal_all_bombs()
+        import tkinter.dialog as tkdiag
         title = "You lost..."
         if self.model.get_undos_remaining() > 0:
+            # The game ends now, not once the player has answered
+            ended_at = time.time()
             msg = f"You have {self.model.get_undos_remaining()} undos remaining.\nDo you want to undo last move?"
             strings = ('Undo', 'New Game', 'Quit')
             question = tkdiag.Dialog(title=title, text=msg, bitmap="question", strings=strings, default=0)
             ans = strings[question.num]
             if ans == strings[0]:
                 self.undo_state()
-            elif ans == strings[1]:
+                return
+            self.record_game(won=False, ended_at=ended_at)
+            if ans == strings[1]:
                 self.start_new_game()
             elif ans == strings[2]:
                 sys.exit()
         else:
+            self.record_game(won=False)
             msg = f"You have {self.model.get_undos_remaining()} undos remaining.\nDo you want to play a new game?"
             strings = ('New Game', 'Quit')
             question = tkdiag.Dialog(title=title, text=msg, bitmap="question", strings=strings, default=0)
@@ -99,13 +158,40 @@ class Controller:
             elif ans == strings[1]:
                 sys.exit()
 
-    def start_new_game(self) -> None:
+    def record_game(self, won: bool, ended_at: Optional[float] = None) -> None:
+        """
+        Record the result of the current game in the statistics store
+
+        :param won: Whether the game was won
+        :param ended_at: Time the game ended, now if not given
+        """
+        if self.stats is not None:
+            self.stats.record(result_from_model(self.model, won, ended_at))
+
+    def start_new_game(self, seed: Optional[int] = None) -> None:
         """
         Helper function that resets the board and model and starts a new game
+
+        :param seed: Seed of the bombs layout, a random one is picked if not given
         """
-        self.model.new_game()
+        self.model.new_game(seed)
         self.view.reset_board(self.model.get_height(), self.model.get_width())
 
+    def load_game(self, difficulty: utils.Difficulty, *argv, seed: Optional[int] = None) -> None:
+        """
+        Start a seeded game of the given difficulty, the board is built again at its size
+
+        :param difficulty: Enum of Difficulty
+        :param argv: height, width, bombs of a custom difficulty
+        :param seed: Seed of the bombs layout, a random one is picked if not given
+        :raises ValueError: if parameters are invalid
+        """
+        if not self.model.set_parameters(difficulty, *argv):
+            raise ValueError("Invalid game parameters")
+        self.view.rebuild_board()
+        self.view.set_cbox_value(difficulty.value)
+        self.start_new_game(seed)
+
     def undo_state(self) -> None:
         """
         Helper function that restores state of model and board to previous one
@@ -119,6 +205,12 @@ class Controller:
         """
         return self.model.get_undos_remaining() > 0 or self.model.get_memento_instances() == 0
 
+    def is_square_revealed(self, i: int, j: int) -> bool:
+        """
+        Helper function that checks if the (i, j) square is revealed
+        """
+        return self.model.is_square_revealed(i, j)
+
     def get_undos_remaining(self) -> int:
         """
         Helper function that returns the number of undos remaining
@@ -160,6 +252,7 @@ class Controller:
         :type difficulty: Difficulty
         """
         if difficulty == utils.Difficulty.CUSTOM:
+            import tkinter.simpledialog as tksmpl
             title = "Enter custom values (5-50)"
             while True:
                 prompt = "Height:"
@@ -185,11 +278,14 @@ class Controller:
         self.model.set_parameters(difficulty)
         self.model.new_game()
 
-    def reveal_all_bombs(self):
+    def reveal_all_bombs(self) -> None:
         """
-        Helper function that reveals all bombs on the board
+        Helper function that reveals all unflagged bombs on the board, once no undo is left
         """
-        for i in range(self.model.get_height()):
-            for j in range(self.model.get_width()):
-                if self.model.grid.board[i][j].is_bomb and not self.model.grid.board[i][j].is_flagged and self.model.undos_remaining == 0:
-                    self.view.set_bomb(i, j)
+        if self.model.undos_remaining != 0:
+            return
+        grid = self.model.grid
+        # Only the bombs are visited, from the mines index of the grid
+        for (i, j) in grid.get_mine_positions():
+            if not grid.board[i][j].is_flagged:
+                self.view.set_bomb(i, j)
@@ -1,23 +1,67 @@
 import random
 from itertools import product
-from typing import Any
+from typing import Any, Optional
 
+from constants import DEFAULT_LAYOUT_GENERATION_CELLS
+from generation import Layout, generate_layout
+from persistent import BoardSnapshot, PersistentBoard, REVEALED, FLAGGED
 from utils import BoardState
 
+_MASK_64 = (1 << 64) - 1
+# Zobrist key kinds of a square: revealed with 0-8 bombs around, revealed bomb, flagged, bomb
+_REVEALED_KIND = 0
+_REVEALED_BOMB_KIND = 9
+_FLAGGED_KIND = 10
+_BOMB_KIND = 11
+_KINDS = 12
+
+
+def zobrist_key(index: int, kind: int) -> int:
+    """
+    Return the 64-bit Zobrist key of a square in a given state.
+    Keys are derived from the square index with splitmix64, so no table has to be stored
+    and the same square always gets the same key, on any board of the same width.
+
+    :param index: Flat index of the square, i * width + j
+    :param kind: State of the square
+    :return: 64-bit key
+    """
+    z = (index * _KINDS + kind + 0x9E3779B97F4A7C15) & _MASK_64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK_64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK_64
+    return z ^ (z >> 31)
+
 
 class Grid:
     """ A game grid, containing Cell """
 
-    def __init__(self, width: int, height: int, bombs: int) -> None:
+    def __init__(self, width: int, height: int, bombs: int, seed: Optional[int] = None, mine: bool = True) -> None:
+        """
+        :param width: Width of the grid
+        :param height: Height of the grid
+        :param bombs: Number of bombs
+        :param seed: Seed of the bombs layout, a random one is picked if not given
+        :param mine: Whether to put the bombs, an unmined grid waits for add_bombs, place_bombs or place_layout
+        """
         self.squares_revealed = 0
         self.height = height
         self.width = width
         self.bombs = bombs
         self.bombs_left = bombs
+        self.seed = seed
+        # Zobrist hashes of the revealed/flagged squares, and of the bombs layout
+        self.visible_hash = 0
+        self.bombs_hash = 0
+        # Revealed/flagged state shared with the snapshots taken by get_state
+        self.visible = PersistentBoard(height, width)
+        # Flat indexes (i * width + j) of the bombs and of the flagged squares
+        self.mines = set()
+        self.flags = set()
         # Instantiate board with number of cells by given height and width
         self.board = [[Cell(i, j) for j in range(self.width)]
                       for i in range(self.height)]
-        self.add_bombs()
+        if mine:
+            self.add_bombs(seed)
 
     def reset(self) -> None:
         """ Reset all squares in grid to default values """
@@ -26,20 +70,114 @@ class Grid:
                 cell.reset()
         self.squares_revealed = 0
         self.bombs_left = self.bombs
+        self.visible_hash = 0
+        self.bombs_hash = 0
+        self.visible = PersistentBoard(self.height, self.width)
+        self.mines = set()
+        self.flags = set()
 
-    def add_bombs(self) -> None:
-        """ Fill board squares with bombs """
+    def add_bombs(self, seed: Optional[int] = None) -> None:
+        """
+        Fill board squares with bombs.
+        Boards of DEFAULT_LAYOUT_GENERATION_CELLS squares and more are generated by bands of rows,
+        in parallel, so a given size and seed always give the same layout.
+
+        :param seed: Seed of the bombs layout, a random one is picked if not given
+        """
         if self.bombs <= 0 or self.bombs >= self.height * self.width:
             raise Exception("Invalid number of bombs.")
         else:
+            # Keep the seed so the same layout can be generated again
+            self.seed = random.randrange(2 ** 63) if seed is None else seed
+            if self.height * self.width >= DEFAULT_LAYOUT_GENERATION_CELLS:
+                self.place_layout(generate_layout(self.height, self.width, self.bombs, self.seed))
+                return
             # sample makes random choices with distinct elements
             # we don't want several bombs on the same square
-            pos = random.sample([(i, j) for j in range(self.width)
+            pos = random.Random(self.seed).sample([(i, j) for j in range(self.width)
                                  for i in range(self.height)], self.bombs)
-            for (i, j) in pos:
-                self.board[i][j].is_bomb = True
-                for (i2, j2) in self.get_neighbours(i, j):
-                    self.board[i2][j2].bombs_around += 1
+            self.place_bombs(pos)
+
+    def place_bombs(self, positions: list[tuple[int, int]]) -> None:
+        """
+        Put bombs on the given squares and update the bombs count around them
+
+        :param positions: List of (i, j) locations of the bombs
+        """
+        for (i, j) in positions:
+            self.board[i][j].is_bomb = True
+            self.mines.add(i * self.width + j)
+            self.bombs_hash ^= zobrist_key(i * self.width + j, _BOMB_KIND)
+            for (i2, j2) in self.get_neighbours(i, j):
+                self.board[i2][j2].bombs_around += 1
+
+    def place_layout(self, layout: Layout) -> None:
+        """
+        Put the bombs of a layout made by generation.generate_layout, with their counts
+
+        :param layout: Layout of a board of the same size and number of bombs
+        :raises ValueError: if the layout doesn't match the grid or the grid already has bombs
+        """
+        if (layout.height, layout.width, layout.bombs) != (self.height, self.width, self.bombs):
+            raise ValueError("Layout doesn't match the size of the grid")
+        if self.mines:
+            raise ValueError("Grid already has bombs, reset it first")
+        self.seed = layout.seed
+        mines = layout.mines
+        counts = layout.counts
+        k = 0
+        for line in self.board:
+            for cell in line:
+                if mines[k]:
+                    cell.is_bomb = True
+                    self.mines.add(k)
+                    self.bombs_hash ^= zobrist_key(k, _BOMB_KIND)
+                cell.bombs_around = counts[k]
+                k += 1
+
+    def reveal(self, i: int, j: int) -> tuple[bool, int]:
+        """
+        Reveal the (i, j) square, updating the visible state hash
+
+        :param i: Height location of the cell
+        :param j: Width location of the cell
+        :return: Tuple of is_bomb and bombs_around values
+        """
+        cell = self.board[i][j]
+        if not cell.is_revealed:
+            self.visible_hash ^= self._revealed_key(cell)
+            self.visible.set(i, j, self.visible.get(i, j) | REVEALED)
+        return cell.reveal()
+
+    def set_flagged(self, i: int, j: int, is_flagged: bool) -> None:
+        """
+        Flag or unflag the (i, j) square, updating the visible state hash
+
+        :param i: Height location of the cell
+        :param j: Width location of the cell
+        :param is_flagged: Whether the square is flagged
+        """
+        cell = self.board[i][j]
+        if cell.is_flagged != is_flagged:
+            self.visible_hash ^= zobrist_key(i * self.width + j, _FLAGGED_KIND)
+            self.visible.set(i, j, self.visible.get(i, j) ^ FLAGGED)
+            cell.is_flagged = is_flagged
+            if is_flagged:
+                self.flags.add(i * self.width + j)
+            else:
+                self.flags.discard(i * self.width + j)
+
+    def get_position_key(self) -> tuple[int, int, int, int]:
+        """
+        Return a key identifying what a player sees of the board, for caching analysis results
+
+        :return: Tuple of height, width, bombs and the visible state hash
+        """
+        return self.height, self.width, self.bombs, self.visible_hash
+
+    def _revealed_key(self, cell: 'Cell') -> int:
+        kind = _REVEALED_BOMB_KIND if cell.is_bomb else _REVEALED_KIND + cell.bombs_around
+        return zobrist_key(cell.x * self.width + cell.y, kind)
 
     def get_neighbours(self, i: int, j: int) -> list[tuple[Any, Any]]:
         """
@@ -58,35 +196,53 @@ class Grid:
 
     def get_state(self) -> BoardState:
         """
-        Returns a nested list representing the current Grid state
+        Returns the current Grid state, in O(1) as it shares the board with the Grid
 
-        :return: GridState.state -> List[List[dict[str, bool]]]
+        :return: BoardState whose grid_state is a snapshot of the revealed/flagged squares
         """
-        return BoardState(
-            grid_state=[
-                [{'is_revealed': self.board[i][j].is_revealed, 'is_flagged': self.board[i][j].is_flagged} for j in
-                 range(self.width)]
-                for i in range(self.height)], squares_revealed=self.squares_revealed,
-            bombs_left=self.bombs_left)
+        return BoardState(grid_state=self.visible.snapshot(), squares_revealed=self.squares_revealed,
+                          bombs_left=self.bombs_left)
 
     def set_state(self, state: BoardState) -> None:
         """
-        Set Grid's state by given state
+        Set Grid's state by given state, only the squares that differ are updated
 
         :param state: BoardState representing the current Grid state
         """
-        for i in range(self.height):
-            for j in range(self.width):
-                self.board[i][j].is_revealed = state.grid_state[i][j]['is_revealed']
-                self.board[i][j].is_flagged = state.grid_state[i][j]['is_flagged']
+        for (i, j, value, new_value) in self.visible.changed_cells(state.grid_state):
+            cell = self.board[i][j]
+            if (value ^ new_value) & REVEALED:
+                self.visible_hash ^= self._revealed_key(cell)
+                cell.is_revealed = bool(new_value & REVEALED)
+            if (value ^ new_value) & FLAGGED:
+                self.visible_hash ^= zobrist_key(i * self.width + j, _FLAGGED_KIND)
+                cell.is_flagged = bool(new_value & FLAGGED)
+                self.flags.symmetric_difference_update((i * self.width + j,))
+        self.visible.restore(state.grid_state)
         self.bombs_left = state.bombs_left
         self.squares_revealed = state.squares_revealed
 
-    def get_grid_state(self) -> list[list[dict[str, bool]]]:
+    def get_mine_positions(self) -> list[tuple[int, int]]:
+        """
+        Return the locations of the bombs, from the mines index
+
+        :return: List of (i, j) locations, row by row
+        """
+        return [divmod(k, self.width) for k in sorted(self.mines)]
+
+    def get_wrong_flags(self) -> list[tuple[int, int]]:
+        """
+        Return the flagged squares which don't hold a bomb
+
+        :return: List of (i, j) locations, row by row
+        """
+        return [divmod(k, self.width) for k in sorted(self.flags - self.mines)]
+
+    def get_grid_state(self) -> BoardSnapshot:
         """
         Return the current Grid state
 
-        :return: GridState.state -> List[List[dict[str, bool]]]
+        :return: Snapshot of the revealed/flagged squares
         """
         return self.get_state().grid_state
 
@@ -96,7 +252,7 @@ class Grid:
 
         :return: Number of squares revealed
         """
-        return sum([sum([1 for cell in line if cell.is_revealed]) for line in self.board])
+        return self.squares_revealed
 
     def get_bombs_left(self) -> int:
         """
@@ -104,7 +260,7 @@ class Grid:
 
         :return: Number of bombs left
         """
-        return self.bombs - sum([sum([1 for cell in line if cell.is_flagged]) for line in self.board])
+        return self.bombs_left
 
 
 class Cell:
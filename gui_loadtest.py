@@ -0,0 +1,266 @@
+"""
+Synthetic input load test of the Tk front end, under a virtual X server.
+
+The real View and Controller of main.py are started (with game over dialogs replaced, as they
+would wait for a click) and scripted input is injected with event_generate on the board
+widgets: large flood fills, rapid flag toggling, repeated undos through the undo button and
+difficulty switches through the combobox. Input to paint latency of every event and event loop stalls are
+measured, and the run fails when they exceed their budgets.
+
+    python gui_loadtest.py --output gui_loadtest.json
+
+Xvfb is started when there is no DISPLAY.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Iterator, Optional
+
+from constants import DEFAULT_LATENCY_BUDGET_MS, DEFAULT_STALL_BUDGET_MS, DEFAULT_UNDO_TRIES
+from controller import Controller
+from utils import Difficulty
+
+# Seed of every bombs layout of the load test
+SEED = 20240501
+# Interval of the heartbeat measuring event loop stalls
+HEARTBEAT_MS = 5
+# Interval between two injected events
+EVENT_INTERVAL_MS = 1
+
+
+class LoadTestController(Controller):
+    """ Controller whose game over dialogs are replaced by a counter, so no input is awaited """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.games_won = 0
+        self.games_lost = 0
+
+    def win_game(self) -> None:
+        self.games_won += 1
+
+    def lose_game(self) -> None:
+        self.reveal_all_bombs()
+        self.games_lost += 1
+
+
+class GuiLoadTest:
+    """ Injects the scenarios into the running GUI and measures it """
+
+    def __init__(self, flag_toggles: int, undos: int, switches: int) -> None:
+        """
+        :param flag_toggles: Number of right clicks of the flag toggling scenario
+        :param undos: Number of moves, then undos, of the undo scenario
+        :param switches: Number of difficulty switches
+        """
+        self.flag_toggles = flag_toggles
+        self.undos = undos
+        self.switches = switches
+        self.view = None
+        self.controller = None
+        self.latencies = {}
+        self.stalls = []
+        self._steps = None
+        self._last_tick = None
+        self._done = False
+
+    def run(self) -> dict:
+        """
+        Start the GUI, run every scenario and return the measurements
+
+        :return: Dictionary of latency and stall statistics
+        """
+        import tkinter as tk
+        from main import create_game
+        self.view, self.controller = create_game(controller_class=LoadTestController, on_ready=self._start)
+        tk.mainloop()
+        return self.get_report()
+
+    def _start(self) -> None:
+        self._steps = self._scenarios()
+        self._last_tick = time.perf_counter()
+        self.view.window.after(HEARTBEAT_MS, self._heartbeat)
+        self.view.window.after(EVENT_INTERVAL_MS, self._next_step)
+
+    def _heartbeat(self) -> None:
+        now = time.perf_counter()
+        self.stalls.append(max(0.0, now - self._last_tick - HEARTBEAT_MS / 1000))
+        self._last_tick = now
+        if not self._done:
+            self.view.window.after(HEARTBEAT_MS, self._heartbeat)
+
+    def _next_step(self) -> None:
+        try:
+            scenario, inject = next(self._steps)
+        except StopIteration:
+            self._done = True
+            self.view.window.after(HEARTBEAT_MS * 2, self.view.window.destroy)
+            return
+        start = time.perf_counter()
+        inject()
+
+        def _painted() -> None:
+            # Flush the redraws scheduled by the event, it is painted once they are done
+            self.view.window.update_idletasks()
+            self.latencies.setdefault(scenario, []).append(time.perf_counter() - start)
+            self.view.window.after(EVENT_INTERVAL_MS, self._next_step)
+
+        self.view.window.after_idle(_painted)
+
+    # Input ########################################################################
+
+    def click(self, i: int, j: int, button: int = 1) -> Callable[[], None]:
+        """ Return an injection of a click on the (i, j) square, queued behind pending events """
+        def _inject() -> None:
+            self.view.board[i][j].event_generate(f"<Button-{button}>", x=5, y=5, when='tail')
+
+        return _inject
+
+    def press(self, button) -> Callable[[], None]:
+        """ Return an injection of a press of a button, which does nothing while it is disabled """
+        def _inject() -> None:
+            button.invoke()
+
+        return _inject
+
+    def select_difficulty(self, difficulty: Difficulty) -> Callable[[], None]:
+        """ Return an injection of a difficulty selection in the combobox """
+        def _inject() -> None:
+            self.view.difficulty_cbox.set(difficulty.value)
+            self.view.difficulty_cbox.event_generate("<<ComboboxSelected>>", when='tail')
+
+        return _inject
+
+    # Scenarios ####################################################################
+
+    def _scenarios(self) -> Iterator[tuple[str, Callable[[], None]]]:
+        yield from self._flood_fill()
+        yield from self._flag_toggling()
+        yield from self._undos()
+        yield from self._difficulty_switches()
+
+    def _flood_fill(self) -> Iterator[tuple[str, Callable[[], None]]]:
+        # A sparse board of the largest size the GUI allows, so a click opens most of it
+        self.controller.load_game(Difficulty.CUSTOM, 50, 50, 25, seed=SEED)
+        grid = self.controller.model.grid
+        openings = [(cell.x, cell.y) for line in grid.board for cell in line
+                    if not cell.is_bomb and cell.bombs_around == 0]
+        for (i, j) in openings:
+            if not grid.board[i][j].is_revealed:
+                yield 'flood_fill', self.click(i, j)
+
+    def _flag_toggling(self) -> Iterator[tuple[str, Callable[[], None]]]:
+        self.controller.load_game(Difficulty.HARD, seed=SEED)
+        for _ in range(self.flag_toggles):
+            yield 'flag_toggle', self.click(0, 0, button=3)
+
+    def _undos(self) -> Iterator[tuple[str, Callable[[], None]]]:
+        # Every game has its undo budget, a new seeded game is started once it is used up
+        undos = 0
+        game = 0
+        while undos < self.undos:
+            self.controller.load_game(Difficulty.HARD, seed=SEED + game)
+            game += 1
+            batch = min(DEFAULT_UNDO_TRIES, self.undos - undos)
+            grid = self.controller.model.grid
+            safe = (cell for line in grid.board for cell in line if not cell.is_bomb)
+            for _ in range(batch):
+                # Squares opened by the previous clicks are skipped, so each click is a move
+                cell = next(cell for cell in safe if not cell.is_revealed)
+                yield 'undo_moves', self.click(cell.x, cell.y)
+            for _ in range(batch):
+                yield 'undo', self.press(self.view.undo_button)
+            undos += batch
+
+    def _difficulty_switches(self) -> Iterator[tuple[str, Callable[[], None]]]:
+        difficulties = [Difficulty.EASY, Difficulty.MEDIUM, Difficulty.HARD]
+        for k in range(self.switches):
+            yield 'difficulty_switch', self.select_difficulty(difficulties[k % len(difficulties)])
+
+    # Report #######################################################################
+
+    def get_report(self) -> dict:
+        report = {'latency_ms': {}, 'stall_ms': {}}
+        for scenario, latencies in self.latencies.items():
+            latencies = sorted(latencies)
+            report['latency_ms'][scenario] = {
+                'events': len(latencies), 'p50': round(statistics.median(latencies) * 1000, 3),
+                'p99': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+                'max': round(latencies[-1] * 1000, 3)}
+        if self.stalls:
+            report['stall_ms'] = {'max': round(max(self.stalls) * 1000, 3),
+                                  'total': round(sum(self.stalls) * 1000, 3)}
+        return report
+
+
+def check_budgets(report: dict, latency_budget_ms: float, stall_budget_ms: float) -> list[str]:
+    """
+    Compare a report against the budgets
+
+    :param report: Report of GuiLoadTest.run
+    :param latency_budget_ms: Budget of the 99th percentile latency of every scenario
+    :param stall_budget_ms: Budget of the longest event loop stall
+    :return: List of exceeded budgets, empty if all are respected
+    """
+    failures = []
+    for scenario, latency in report['latency_ms'].items():
+        if latency['p99'] > latency_budget_ms:
+            failures.append(f"{scenario}: p99 latency {latency['p99']} ms > {latency_budget_ms} ms")
+    stall = report['stall_ms'].get('max', 0)
+    if stall > stall_budget_ms:
+        failures.append(f"event loop stalled {stall} ms > {stall_budget_ms} ms")
+    return failures
+
+
+def start_xvfb() -> Optional[subprocess.Popen]:
+    """
+    Start a virtual X server if there is no display
+
+    :return: The Xvfb process, or None if a display is already set
+    """
+    if os.environ.get('DISPLAY'):
+        return None
+    if shutil.which('Xvfb') is None:
+        sys.exit("No DISPLAY and Xvfb isn't installed")
+    display = 99
+    while os.path.exists(f'/tmp/.X11-unix/X{display}'):
+        display += 1
+    process = subprocess.Popen(['Xvfb', f':{display}', '-screen', '0', '1600x1200x24', '-nolisten', 'tcp'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        if os.path.exists(f'/tmp/.X11-unix/X{display}'):
+            break
+        time.sleep(0.05)
+    os.environ['DISPLAY'] = f':{display}'
+    return process
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Synthetic input load test of the Tk front end")
+    parser.add_argument('--flag-toggles', type=int, default=500)
+    parser.add_argument('--undos', type=int, default=100)
+    parser.add_argument('--switches', type=int, default=15)
+    parser.add_argument('--latency-budget-ms', type=float, default=DEFAULT_LATENCY_BUDGET_MS,
+                        help="Budget of the 99th percentile input to paint latency of every scenario")
+    parser.add_argument('--stall-budget-ms', type=float, default=DEFAULT_STALL_BUDGET_MS,
+                        help="Budget of the longest event loop stall")
+    parser.add_argument('--output', help="Path to write the results to as JSON")
+    args = parser.parse_args()
+
+    xvfb = start_xvfb()
+    try:
+        report = GuiLoadTest(args.flag_toggles, args.undos, args.switches).run()
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+    report['failures'] = check_budgets(report, args.latency_budget_ms, args.stall_budget_ms)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if report['failures'] else 0)
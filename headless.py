@@ -0,0 +1,88 @@
+"""
+View without widgets, shared by the front ends which don't paint on every update.
+
+The Controller calls the same methods as on the Tk View, they only mark the squares as dirty.
+Front ends then read the final state of the dirty squares from the grid when they draw a frame
+(autoplay, terminal) or answer a request (server), however many updates a square went through.
+"""
+from model import Model
+from utils import BoardState
+
+
+class DirtyView:
+    """ View marking the squares updated by the Controller as dirty """
+
+    def __init__(self, model: Model) -> None:
+        """
+        :param model: Model of the game
+        """
+        self.model = model
+        self.controller = None
+        self.dirty = set()
+        # Whole board to draw again, after a new game or an undo
+        self.all_dirty = True
+        # Bombs shown at the end of a game, which are not revealed in the grid
+        self.bombs_shown = set()
+
+    def set_controller(self, controller) -> None:
+        self.controller = controller
+
+    def is_empty_image(self, i: int, j: int) -> bool:
+        """
+        Checks whether cell shows no flag or mine
+
+        :param i: Height location of the cell
+        :param j: Width location of the cell
+        :return: True/False if cell has no image
+        """
+        cell = self.model.grid.board[i][j]
+        return not cell.is_flagged and not (cell.is_bomb and cell.is_revealed)
+
+    def set_bomb(self, i: int, j: int) -> None:
+        self.bombs_shown.add((i, j))
+        self.dirty.add((i, j))
+
+    def set_clicked(self, i: int, j: int) -> None:
+        self.dirty.add((i, j))
+
+    def set_unclicked(self, i: int, j: int) -> None:
+        self.dirty.add((i, j))
+
+    def set_bomb_text(self, i: int, j: int, text: str, color: str) -> None:
+        self.dirty.add((i, j))
+
+    def set_flag(self, i: int, j: int) -> None:
+        self.dirty.add((i, j))
+
+    def set_disabled(self, i: int, j: int) -> None:
+        self.dirty.add((i, j))
+
+    def reset_board(self, height: int, width: int) -> None:
+        self.bombs_shown = set()
+        self.dirty = set()
+        self.all_dirty = True
+
+    def board_to_state(self, grid_state: BoardState) -> None:
+        self.bombs_shown = set()
+        self.dirty = set()
+        self.all_dirty = True
+
+    def set_cbox_value(self, value) -> None:
+        pass
+
+    def rebuild_board(self) -> None:
+        self.all_dirty = True
+
+    def pop_dirty(self) -> set[tuple[int, int]]:
+        """
+        Return the squares marked as dirty since the last call and clear them
+
+        :return: Set of (i, j) locations, every square of the board if it is all dirty
+        """
+        if self.all_dirty:
+            dirty = {(i, j) for i in range(self.model.get_height()) for j in range(self.model.get_width())}
+        else:
+            dirty = self.dirty
+        self.dirty = set()
+        self.all_dirty = False
+        return dirty
@@ -0,0 +1,274 @@
+"""
+Optional instrumentation of the click handling hot path.
+
+Nothing is measured unless enable() is called: the wrappers are installed on the classes
+at that point, so a disabled profiler adds no cost at all.
+For every operation a count and a latency histogram are kept, along with the number of
+cells touched and Tk calls issued by every move. Time spent in the game over dialogs, waiting
+for the player, is left out of the move that opened them.
+
+    MINESWEEPER_PROFILE=profile.json python main.py
+"""
+import json
+import time
+from functools import wraps
+from typing import Callable, Optional
+
+# Operations wrapped by the profiler, as (module, class, method)
+OPERATIONS = [
+    ('controller', 'Controller', 'left_handler'),
+    ('controller', 'Controller', 'right_handler'),
+    ('controller', 'Controller', 'chord_handler'),
+    ('controller', 'Controller', 'undo_state'),
+    ('controller', 'Controller', 'start_new_game'),
+    ('model', 'Model', 'save_state'),
+    ('grid', 'Grid', 'add_bombs'),
+    ('view', 'View', 'create_board'),
+    ('view', 'View', 'reset_board'),
+    ('view', 'View', 'board_to_state'),
+]
+
+# Operations which go on in later Tk callbacks, timed until their on_complete callback
+COMPLETED_OPERATIONS = {'View.create_board'}
+
+# Top level operations which are a player's move
+MOVES = {'Controller.left_handler', 'Controller.right_handler', 'Controller.chord_handler',
+         'Controller.undo_state', 'Controller.start_new_game'}
+
+# View methods repainting a single cell
+CELL_PAINTS = ['set_bomb', 'set_clicked', 'set_unclicked', 'set_bomb_text', 'set_flag', 'set_disabled']
+
+# Number of histogram buckets, bucket k holds values of [2^(k-1), 2^k)
+HISTOGRAM_BUCKETS = 64
+
+
+class Histogram:
+    """ Count, total and power of two histogram of integer samples (durations in ns or counts) """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+
+    def add(self, value: int) -> None:
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.buckets[min(value.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+
+    def percentile(self, percent: float) -> int:
+        """
+        Return an upper bound of a percentile of the samples
+
+        :param percent: Percentile to return, between 0 and 100
+        :return: Upper bound of the bucket holding the percentile
+        """
+        rank = self.count * percent / 100
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(2 ** bucket - 1, self.max)
+        return 0
+
+    def to_dict(self, scale: int = 1) -> dict:
+        """
+        :param scale: Divisor applied to all values, 1000 turns nanoseconds into microseconds
+        :return: JSON serializable dictionary
+        """
+        return {'count': self.count,
+                'mean': round(self.total / self.count / scale, 3) if self.count else 0.0,
+                'p50': self.percentile(50) / scale, 'p99': self.percentile(99) / scale, 'max': self.max / scale,
+                'histogram': {(2 ** bucket - 1) / scale: count for bucket, count in enumerate(self.buckets) if count}}
+
+
+class Profiler:
+    """ Collects operation timings, cells touched and Tk calls issued per move """
+
+    def __init__(self) -> None:
+        self.operations = {}
+        self.cells_touched = {}
+        self.tk_calls = {}
+        self.total_tk_calls = 0
+        self._running = set()
+        self._move_depth = 0
+        self._move_cells = set()
+        self._move_tk_calls = 0
+        # Time spent in modal dialogs, which is not part of the operations that opened them
+        self._paused_ns = 0
+        self._originals = []
+
+    def install(self) -> None:
+        """ Wrap the instrumented methods and the Tk widget calls """
+        import importlib
+        for module_name, class_name, method_name in OPERATIONS:
+            cls = getattr(importlib.import_module(module_name), class_name)
+            name = f'{class_name}.{method_name}'
+            timed = self._timed_until_complete if name in COMPLETED_OPERATIONS else self._timed
+            self._patch(cls, method_name, timed(name, getattr(cls, method_name)))
+        view_cls = importlib.import_module('view').View
+        for method_name in CELL_PAINTS:
+            self._patch(view_cls, method_name, self._cell_paint(getattr(view_cls, method_name)))
+
+        import tkinter
+        import tkinter.dialog
+        # The game over dialogs wait for the player inside the move that ended the game
+        self._patch(tkinter.dialog.Dialog, '__init__', self._dialog(tkinter.dialog.Dialog.__init__))
+        # __setitem__ and configure both go through _configure, __getitem__ is an alias of cget
+        for method_name in ('_configure', 'cget', '__getitem__'):
+            self._patch(tkinter.Misc, method_name, self._tk_call(getattr(tkinter.Misc, method_name)))
+
+    def uninstall(self) -> None:
+        """ Restore the original methods """
+        for cls, method_name, original in reversed(self._originals):
+            setattr(cls, method_name, original)
+        self._originals = []
+
+    def _patch(self, cls, method_name: str, wrapper: Callable) -> None:
+        self._originals.append((cls, method_name, cls.__dict__[method_name]))
+        setattr(cls, method_name, wrapper)
+
+    def _timed(self, name: str, method: Callable) -> Callable:
+        stats = self.operations.setdefault(name, Histogram())
+        is_move = name in MOVES
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            # Recursive calls, like the flood fill of left_handler, are part of the outermost call
+            if name in self._running:
+                return method(*args, **kwargs)
+            self._running.add(name)
+            if is_move:
+                self._move_depth += 1
+            start = time.perf_counter_ns()
+            paused = self._paused_ns
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stats.add(time.perf_counter_ns() - start - (self._paused_ns - paused))
+                self._running.discard(name)
+                if is_move:
+                    self._move_depth -= 1
+                    if self._move_depth == 0:
+                        self._end_move(name)
+
+        return wrapper
+
+    def _timed_until_complete(self, name: str, method: Callable) -> Callable:
+        """ Time a method taking an on_complete callback, such as a progressive create_board, until it is called """
+        stats = self.operations.setdefault(name, Histogram())
+
+        @wraps(method)
+        def wrapper(obj, *args, on_complete: Optional[Callable[[], None]] = None, **kwargs):
+            start = time.perf_counter_ns()
+            paused = self._paused_ns
+
+            def _complete() -> None:
+                stats.add(time.perf_counter_ns() - start - (self._paused_ns - paused))
+                if on_complete is not None:
+                    on_complete()
+
+            return method(obj, *args, on_complete=_complete, **kwargs)
+
+        return wrapper
+
+    def _dialog(self, method: Callable) -> Callable:
+        """ Pause the timings and the move accounting while a modal dialog waits for the player """
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            depth, self._move_depth = self._move_depth, 0
+            start = time.perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._paused_ns += time.perf_counter_ns() - start
+                self._move_depth = depth
+
+        return wrapper
+
+    def _cell_paint(self, method: Callable) -> Callable:
+        @wraps(method)
+        def wrapper(view, i, j, *args, **kwargs):
+            if self._move_depth:
+                self._move_cells.add((i, j))
+            return method(view, i, j, *args, **kwargs)
+
+        return wrapper
+
+    def _tk_call(self, method: Callable) -> Callable:
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            self.total_tk_calls += 1
+            # Periodic updates of the top frame run between moves and are only counted in the total
+            if self._move_depth:
+                self._move_tk_calls += 1
+            return method(*args, **kwargs)
+
+        return wrapper
+
+    def _end_move(self, name: str) -> None:
+        self.cells_touched.setdefault(name, Histogram()).add(len(self._move_cells))
+        self.tk_calls.setdefault(name, Histogram()).add(self._move_tk_calls)
+        self._move_cells = set()
+        self._move_tk_calls = 0
+
+    def to_dict(self) -> dict:
+        """
+        Return all collected data, latencies are in microseconds
+
+        :return: JSON serializable dictionary
+        """
+        return {'latency_us': {name: stats.to_dict(1000) for name, stats in self.operations.items() if stats.count},
+                'cells_touched': {name: stats.to_dict() for name, stats in self.cells_touched.items()},
+                'tk_calls': {name: stats.to_dict() for name, stats in self.tk_calls.items()},
+                'total_tk_calls': self.total_tk_calls}
+
+    def dump(self, path: str) -> None:
+        """
+        Write all collected data to a JSON file
+
+        :param path: Path of the file
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary_lines(self) -> list[str]:
+        """
+        Return a short human readable summary, one line per operation
+
+        :return: List of lines
+        """
+        lines = [f"{'operation':<26}{'count':>7}{'p50 us':>9}{'p99 us':>9}{'max us':>10}"]
+        for name, stats in self.operations.items():
+            if stats.count:
+                lines.append(f"{name:<26}{stats.count:>7}{stats.percentile(50) / 1000:>9.0f}"
+                             f"{stats.percentile(99) / 1000:>9.0f}{stats.max / 1000:>10.0f}")
+        for name, stats in self.cells_touched.items():
+            lines.append(f"{name:<26} cells max {stats.max}, tk calls max {self.tk_calls[name].max}")
+        return lines
+
+
+PROFILER: Optional[Profiler] = None
+
+
+def enable() -> Profiler:
+    """
+    Start instrumenting the hot path
+
+    :return: The active profiler
+    """
+    global PROFILER
+    if PROFILER is None:
+        PROFILER = Profiler()
+        PROFILER.install()
+    return PROFILER
+
+
+def disable() -> None:
+    """ Stop instrumenting, removing every wrapper """
+    global PROFILER
+    if PROFILER is not None:
+        PROFILER.uninstall()
+        PROFILER = None
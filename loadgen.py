@@ -0,0 +1,156 @@
+"""
+Load generator for server.py.
+
+Opens many concurrent game sessions spread over a number of connections, plays random
+reveal/flag/undo moves on each and reports the request latency percentiles.
+Without --host/--unix an in-process server is started on a free local port.
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from typing import Optional
+
+from constants import DEFAULT_MAX_RESIDENT_CELLS
+from server import GameServer, SessionStore, start_server
+
+
+class Client:
+    """ Pipelined client connection, responses come back in request order """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.pending = asyncio.Queue()
+        self.next_id = 0
+        self.receiver = asyncio.create_task(self._receive())
+
+    async def request(self, **request) -> tuple[dict, float]:
+        """
+        Send a request and wait for its response
+
+        :return: Tuple of the response and its latency in seconds
+        """
+        self.next_id += 1
+        request['id'] = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        start = time.perf_counter()
+        await self.pending.put(future)
+        self.writer.write(json.dumps(request).encode() + b'\n')
+        await self.writer.drain()
+        response = await future
+        return response, time.perf_counter() - start
+
+    async def _receive(self) -> None:
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return
+            future = await self.pending.get()
+            future.set_result(json.loads(line))
+
+    async def close(self) -> None:
+        """ Close the connection once the server answered every pending request """
+        self.writer.write_eof()
+        await self.receiver
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def play_session(client: Client, moves: int, difficulty: str, latencies: list[float],
+                       rng: random.Random) -> None:
+    """
+    Create a session and play random moves on it
+
+    :param client: Connection to send requests on
+    :param moves: Number of moves to play
+    :param difficulty: Difficulty of the session
+    :param latencies: List to append the latency of every request to
+    :param rng: Random generator choosing the moves
+    """
+    response, latency = await client.request(op='new', difficulty=difficulty)
+    latencies.append(latency)
+    session, height, width = response['session'], response['height'], response['width']
+    for _ in range(moves):
+        op = rng.choices(('reveal', 'flag', 'undo'), weights=(8, 2, 1))[0]
+        response, latency = await client.request(op=op, session=session,
+                                                 i=rng.randrange(height), j=rng.randrange(width))
+        latencies.append(latency)
+        if response.get('status') in ('won', 'lost'):
+            response, latency = await client.request(op='new', session=session, difficulty=difficulty)
+            latencies.append(latency)
+    response, latency = await client.request(op='close', session=session)
+    latencies.append(latency)
+
+
+async def run_load(sessions: int, connections: int, moves: int, difficulty: str, seed: int,
+                   host: Optional[str], port: int, path: Optional[str]) -> dict:
+    """
+    Run a single load test
+
+    :return: Dictionary with the request count, throughput and latency percentiles
+    """
+    clients = []
+    for _ in range(connections):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=2 ** 20)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=2 ** 20)
+        clients.append(Client(reader, writer))
+    latencies = []
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    await asyncio.gather(*(play_session(clients[k % connections], moves, difficulty, latencies,
+                                        random.Random(rng.random())) for k in range(sessions)))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+    latencies.sort()
+    return {'sessions': sessions, 'requests': len(latencies), 'seconds': round(elapsed, 3),
+            'requests_per_second': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(_percentile(latencies, 50) * 1000, 3),
+            'p99_ms': round(_percentile(latencies, 99) * 1000, 3)}
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    """ Nearest rank percentile of a sorted list """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+async def _main(args: argparse.Namespace) -> None:
+    listener = None
+    host, port, path = args.host, args.port, args.unix
+    if host is None and path is None:
+        snapshot_dir = tempfile.mkdtemp(prefix='minesweeper-sessions-')
+        server = GameServer(SessionStore(snapshot_dir, args.max_cells))
+        listener = await start_server(server, '127.0.0.1', 0)
+        host, port = listener.sockets[0].getsockname()[:2]
+    for sessions in args.sessions:
+        result = await run_load(sessions, min(args.connections, sessions), args.moves, args.difficulty,
+                                args.seed, host, port, path)
+        if listener is not None:
+            result['server'] = server.store.get_stats()
+        print(json.dumps(result))
+    if listener is not None:
+        listener.close()
+        await listener.wait_closed()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load generator for the Minesweeper game server")
+    parser.add_argument('--host', help="Server host, an in-process server is used when not given")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="Unix socket path of the server")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1000, 10000],
+                        help="Concurrent session counts to run, one test per count")
+    parser.add_argument('--connections', type=int, default=100)
+    parser.add_argument('--moves', type=int, default=20, help="Moves played in every session")
+    parser.add_argument('--difficulty', default='Easy')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-cells', type=int, default=DEFAULT_MAX_RESIDENT_CELLS,
+                        help="Memory budget of the in-process server")
+    asyncio.run(_main(parser.parse_args()))
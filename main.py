@@ -1,18 +1,59 @@
+import os
 import tkinter as tk
+from typing import Callable, Optional
+
+import instrument
+from constants import PROFILE_ENV_VAR
 from controller import Controller
 from model import Model
+from stats import StatsStore
+from utils import Difficulty
 from view import View
 
-if __name__ == '__main__':
 
-    # Initialisation of the data ###################################################
-    model = Model()
+def create_game(difficulty: Difficulty = Difficulty.DEFAULT, stats: Optional[StatsStore] = None,
+                on_ready: Optional[Callable[[], None]] = None,
+                controller_class: type[Controller] = Controller) -> tuple[View, Controller]:
+    """
+    Create the game, painting the window before the model and board are built
 
+    :param difficulty: Enum of Difficulty to start with
+    :param stats: Store to record finished games in
+    :param on_ready: Called once the board is complete and accepts clicks
+    :param controller_class: Controller class to use, a subclass may replace the game over dialogs
+    :return: Tuple of the view and controller
+    """
     view = View()
-    controller = Controller(model, view)
+    view.create_window()
+
+    # Initialisation of the data ###################################################
+    model = Model()
+    if difficulty != Difficulty.DEFAULT:
+        model.set_parameters(difficulty)
+        model.new_game()
+    controller = controller_class(model, view, stats)
     view.set_controller(controller)
 
     # Creation of the GUI ##########################################################
-    window = view.create_main_window()
+    view.create_widgets(on_ready)
+    if difficulty != Difficulty.DEFAULT:
+        view.set_cbox_value(difficulty.value)
+    return view, controller
+
+
+if __name__ == '__main__':
+    # Instrumentation is only installed when asked for, its path is where the data is dumped on exit
+    profile_path = os.environ.get(PROFILE_ENV_VAR)
+    profiler = instrument.enable() if profile_path else None
+
+    stats = StatsStore()
+    view, controller = create_game(stats=stats)
+    if profiler is not None:
+        view.create_debug_overlay(profiler)
 
-    tk.mainloop()
+    try:
+        tk.mainloop()
+    finally:
+        stats.close()
+        if profiler is not None:
+            profiler.dump(profile_path)
@@ -54,5 +54,13 @@ class Caretaker:
             raise e
         return self._originator.restore_from_memento(memento)
 
+    def get_history(self) -> list[Originator.Memento]:
+        """
+        Return the saved mementos, oldest first
+
+        :return: Copy of the list of mementos
+        """
+        return list(self._history)
+
     def clear(self):
         self._history.clear()
@@ -0,0 +1,211 @@
+"""
+Memory report of a game session, broken down by subsystem.
+
+A seeded session is played for a number of moves with tracemalloc on, caching the solver
+analysis of every position. The bytes retained by each subsystem are then measured by
+releasing it and reading how much traced memory is freed: solver cache, undo history, view
+(only with a display) and grid. Tk allocates its widgets outside of Python, so the view also
+reports the number of widgets.
+
+    python memory_report.py --height 50 --width 50 --bombs 500 --moves 200
+    python memory_report.py --history memory_history.jsonl
+
+Reports can be appended to a history file to follow them over time, and every `benchmark.py` run
+compares them against the baseline next to the speed benchmarks.
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from constants import DEFAULT_MEMORY_REPORT_MOVES
+from server import new_session
+from solver import Solver
+from transposition import TranspositionCache
+from utils import Difficulty
+
+# Seed of the bombs layout and of the moves
+SEED = 20240501
+# Subsystems of a report, in the order they are released
+SUBSYSTEMS = ('solver_cache', 'undo_history', 'view', 'grid')
+
+
+def _traced() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def _released(release: Callable[[], None]) -> int:
+    """ Return the traced bytes freed by a function """
+    before = _traced()
+    release()
+    return max(0, before - _traced())
+
+
+def count_widgets(widget) -> int:
+    """ Return the number of widgets under a widget, itself included """
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+def play_moves(session, moves: int, cache: TranspositionCache, seed: int = SEED) -> int:
+    """
+    Play moves which don't lose: reveal safe squares and flag some bombs, in a seeded order.
+    The solver analysis of every position reached is stored in the cache.
+
+    :param session: server.SessionController of the game
+    :param moves: Number of moves to play
+    :param cache: Cache of the solver analyses
+    :param seed: Seed of the order of the moves
+    :return: Number of moves played, fewer if the game was won before
+    """
+    grid = session.model.grid
+    solver = Solver(seed)
+    cells = [cell for line in grid.board for cell in line]
+    random.Random(seed).shuffle(cells)
+    played = 0
+    for cell in cells:
+        if played >= moves or session.status != session.PLAYING:
+            break
+        if cell.is_revealed or cell.is_flagged:
+            continue
+        if cell.is_bomb:
+            session.right_handler(cell.x, cell.y)
+        else:
+            session.left_handler(cell.x, cell.y)
+        session.view.pop_changes()
+        cache.get_or_compute(grid.get_position_key(), lambda: solver.next_moves(grid))
+        played += 1
+    return played
+
+
+def measure_memory(height: int, width: int, bombs: int, moves: int = DEFAULT_MEMORY_REPORT_MOVES,
+                   with_view: bool = True) -> dict[str, Any]:
+    """
+    Play a seeded session and measure the memory of its subsystems
+
+    :param height: Height of the board
+    :param width: Width of the board
+    :param bombs: Number of bombs
+    :param moves: Number of moves to play
+    :param with_view: Whether to build the Tk board, needs a display
+    :return: Dictionary of the bytes of every subsystem, with widget and move counts
+    """
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start()
+    try:
+        base = _traced()
+        session = new_session(Difficulty.CUSTOM, height, width, bombs)
+        session.model.new_game(SEED)
+        cache = TranspositionCache()
+        view = None
+        widgets = None
+        if with_view:
+            import tkinter as tk
+            from view import View
+            view = View()
+            view.set_controller(session)
+            view.window = tk.Tk()
+            view.window.withdraw()
+            view.create_images()
+            view.create_board(view.window)
+            view.window.update_idletasks()
+            widgets = count_widgets(view.window)
+        played = play_moves(session, moves, cache)
+        total = _traced() - base
+        peak = tracemalloc.get_traced_memory()[1] - base
+        history = len(session.model.caretaker.get_history())
+        cache_entries = len(cache)
+
+        def _release_view() -> None:
+            nonlocal view
+            if view is not None:
+                view.window.destroy()
+                view = None
+
+        def _release_session() -> None:
+            nonlocal session
+            session = None
+
+        report = {
+            'solver_cache': _released(cache.clear),
+            'undo_history': _released(session.model.caretaker.clear),
+            'view': _released(_release_view) if with_view else None,
+            'grid': _released(_release_session),
+        }
+    finally:
+        if not started:
+            tracemalloc.stop()
+    # Memory of the session which isn't released with a subsystem, such as the Tk interpreter
+    other = total - sum(report[subsystem] or 0 for subsystem in SUBSYSTEMS)
+    report.update({'other': other, 'total': total, 'peak': peak, 'cells': height * width, 'moves': played,
+                   'undo_snapshots': history, 'cache_entries': cache_entries, 'widgets': widgets,
+                   'grid_per_cell': report['grid'] / (height * width)})
+    return report
+
+
+def compare_memory(report: dict[str, Any], baseline: dict[str, Any], threshold: float, name: str = '') -> list[str]:
+    """
+    Compare the subsystems of a report against a baseline report
+
+    :param report: Report of measure_memory
+    :param baseline: Report of a previous run
+    :param threshold: Allowed growth, 0.25 allows 25% more bytes
+    :param name: Prefix of the regression descriptions
+    :return: List of regression descriptions, empty if there are none
+    """
+    regressions = []
+    for subsystem in SUBSYSTEMS + ('total',):
+        value, base = report.get(subsystem), baseline.get(subsystem)
+        if value is None or not base:
+            continue
+        ratio = value / base
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}{subsystem}: {base / 1024:.1f} KiB -> {value / 1024:.1f} KiB "
+                               f"({(ratio - 1) * 100:+.0f}%)")
+    return regressions
+
+
+def format_report(report: dict[str, Any]) -> list[str]:
+    lines = [f"{report['cells']} cells, {report['moves']} moves, {report['undo_snapshots']} undo snapshots, "
+             f"{report['cache_entries']} cached positions"]
+    for subsystem in SUBSYSTEMS + ('other', 'total', 'peak'):
+        if report[subsystem] is None:
+            lines.append(f"{subsystem:<16}{'skipped, no display':>24}")
+        else:
+            lines.append(f"{subsystem:<16}{report[subsystem] / 1024:>20.1f} KiB")
+    if report['widgets'] is not None:
+        lines.append(f"{'widgets':<16}{report['widgets']:>24}")
+    lines.append(f"{'grid per cell':<16}{report['grid_per_cell']:>22.0f} B")
+    return lines
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Memory report of a game session by subsystem")
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--width', type=int, default=24)
+    parser.add_argument('--bombs', type=int, default=99)
+    parser.add_argument('--moves', type=int, default=DEFAULT_MEMORY_REPORT_MOVES)
+    parser.add_argument('--no-view', action='store_true', help="Don't build the Tk board")
+    parser.add_argument('--output', help="Path to write the report to as JSON")
+    parser.add_argument('--history', help="JSON lines file to append the report to")
+    args = parser.parse_args()
+
+    with_view = not args.no_view
+    if with_view:
+        from benchmark import has_display
+        with_view = has_display()
+    result = measure_memory(args.height, args.width, args.bombs, args.moves, with_view)
+    print("\n".join(format_report(result)))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.history:
+        with open(args.history, 'a') as f:
+            f.write(json.dumps({'time': time.time(), 'python': sys.version.split()[0],
+                                'platform': platform.platform(), 'report': result}) + '\n')
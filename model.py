@@ -1,4 +1,5 @@
 import time
+from typing import Optional
 
 from constants import DEFAULT_UNDO_TRIES
 from grid import Grid, BoardState
@@ -18,9 +19,10 @@ class Model:
         self.init_time = time.time()
         self.originator = Originator()
         self.caretaker = Caretaker(self.originator)
-        self.state = BoardState(self.grid.get_grid_state(), 0, bombs)
+        self.state = self.grid.get_state()
         self.memento_instances = 0
         self.undos_remaining = DEFAULT_UNDO_TRIES
+        self.clicks = 0
 
     def save_state(self) -> None:
         """ Save current state as memento """
@@ -49,7 +51,7 @@ class Model:
 
     def set_parameters(self, difficulty: Difficulty, *argv) -> bool:
         """
-        set parameters height, width, bombs
+        set parameters height, width, bombs, the grid is mined by the next new_game
 
         :param difficulty: Enum of Difficulty
         :param argv: height, width, bombs to set values at
@@ -92,17 +94,23 @@ class Model:
             print("Warning : Invalid parameters")
             print("Can't create game with these values")
             return False
-        self.grid = Grid(width, height, bombs)
+        # Bombs are put by the next new_game, so large boards aren't mined twice
+        self.grid = Grid(width, height, bombs, mine=False)
         self.difficulty = difficulty
         return True
 
-    def new_game(self) -> None:
-        """ Resets model values and start a new game """
+    def new_game(self, seed: Optional[int] = None) -> None:
+        """
+        Resets model values and start a new game
+
+        :param seed: Seed of the bombs layout, a random one is picked if not given
+        """
         self.caretaker.clear()
         self.memento_instances = 0
         self.grid.reset()
-        self.grid.add_bombs()
+        self.grid.add_bombs(seed)
         self.undos_remaining = DEFAULT_UNDO_TRIES
+        self.clicks = 0
         self.set_init_time(time.time())
 
     def get_grid(self) -> Grid:
@@ -167,3 +175,15 @@ class Model:
 
     def get_memento_instances(self) -> int:
         return self.memento_instances
+
+    def get_undos_used(self) -> int:
+        return DEFAULT_UNDO_TRIES - self.undos_remaining
+
+    def get_seed(self) -> int:
+        return self.grid.seed
+
+    def get_clicks(self) -> int:
+        return self.clicks
+
+    def add_click(self) -> None:
+        self.clicks += 1
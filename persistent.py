@@ -0,0 +1,155 @@
+"""
+Persistent board state with structural sharing.
+
+The revealed/flagged state of a board is split into 16x16 tiles. Taking a snapshot is O(1):
+the snapshot keeps the current tiles, and the board copies a tile (and the list of tiles)
+only the first time it writes to it after a snapshot. Snapshots are never modified, so any
+number of them, or of branches made from them, can share the tiles they have in common.
+"""
+from typing import Iterator, Optional
+
+# Bits of the value of a square
+REVEALED = 0x01
+FLAGGED = 0x02
+
+# Tiles are TILE x TILE squares
+_TILE_BITS = 4
+TILE = 1 << _TILE_BITS
+_TILE_MASK = TILE - 1
+_TILE_SIZE = TILE * TILE
+# Shared by every untouched tile, copied on first write
+_EMPTY_TILE = bytes(_TILE_SIZE)
+
+
+class BoardSnapshot:
+    """ Immutable revealed/flagged state of a board """
+
+    __slots__ = ('height', 'width', '_tiles_per_row', '_tiles')
+
+    def __init__(self, height: int, width: int, tiles: Optional[list] = None) -> None:
+        """
+        :param height: Height of the board
+        :param width: Width of the board
+        :param tiles: Tiles of the board, all squares are hidden if not given
+        """
+        self.height = height
+        self.width = width
+        self._tiles_per_row = (width + _TILE_MASK) >> _TILE_BITS
+        if tiles is None:
+            tiles = [_EMPTY_TILE] * (self._tiles_per_row * ((height + _TILE_MASK) >> _TILE_BITS))
+        self._tiles = tiles
+
+    def get(self, i: int, j: int) -> int:
+        """
+        Return the value of the (i, j) square, a combination of REVEALED and FLAGGED
+
+        :param i: Height location of the cell
+        :param j: Width location of the cell
+        :return: Value of the square
+        """
+        return self._tiles[(i >> _TILE_BITS) * self._tiles_per_row + (j >> _TILE_BITS)][
+            ((i & _TILE_MASK) << _TILE_BITS) | (j & _TILE_MASK)]
+
+    def is_revealed(self, i: int, j: int) -> bool:
+        return bool(self.get(i, j) & REVEALED)
+
+    def is_flagged(self, i: int, j: int) -> bool:
+        return bool(self.get(i, j) & FLAGGED)
+
+    def to_bytes(self) -> bytes:
+        """
+        Return the values of all squares, row by row
+
+        :return: One byte per square
+        """
+        return bytes(self.get(i, j) for i in range(self.height) for j in range(self.width))
+
+    @classmethod
+    def from_bytes(cls, height: int, width: int, data: bytes) -> 'BoardSnapshot':
+        """
+        Create a snapshot from the values of all squares, as returned by to_bytes
+
+        :param height: Height of the board
+        :param width: Width of the board
+        :param data: One byte per square, row by row
+        :return: The snapshot
+        """
+        board = PersistentBoard(height, width)
+        for k, value in enumerate(data):
+            if value:
+                board.set(k // width, k % width, value)
+        return board.snapshot()
+
+    def changed_cells(self, other: 'BoardSnapshot') -> Iterator[tuple[int, int, int, int]]:
+        """
+        Yield the squares whose value differs in another snapshot of the same board.
+        Tiles shared by both snapshots are skipped without being read.
+
+        :param other: Snapshot to compare with
+        :return: Iterator of (i, j, value here, value in other)
+        """
+        for t, (tile, other_tile) in enumerate(zip(self._tiles, other._tiles)):
+            if tile is other_tile or tile == other_tile:
+                continue
+            top = (t // self._tiles_per_row) << _TILE_BITS
+            left = (t % self._tiles_per_row) << _TILE_BITS
+            for offset in range(_TILE_SIZE):
+                if tile[offset] != other_tile[offset]:
+                    yield top + (offset >> _TILE_BITS), left + (offset & _TILE_MASK), tile[offset], other_tile[offset]
+
+    def branch(self) -> 'PersistentBoard':
+        """
+        Return a modifiable board starting from this snapshot, sharing all of its tiles
+
+        :return: The new board
+        """
+        return PersistentBoard(self.height, self.width, self._tiles)
+
+
+class PersistentBoard(BoardSnapshot):
+    """ Modifiable revealed/flagged state of a board, copying tiles on write after a snapshot """
+
+    __slots__ = ('_owns_tiles', '_owned')
+
+    def __init__(self, height: int, width: int, tiles: Optional[list] = None) -> None:
+        super().__init__(height, width, tiles)
+        # Whether the list of tiles and which tiles were copied since the last snapshot
+        self._owns_tiles = False
+        self._owned = set()
+
+    def set(self, i: int, j: int, value: int) -> None:
+        """
+        Set the value of the (i, j) square
+
+        :param i: Height location of the cell
+        :param j: Width location of the cell
+        :param value: Combination of REVEALED and FLAGGED
+        """
+        t = (i >> _TILE_BITS) * self._tiles_per_row + (j >> _TILE_BITS)
+        if t not in self._owned:
+            if not self._owns_tiles:
+                self._tiles = list(self._tiles)
+                self._owns_tiles = True
+            self._tiles[t] = bytearray(self._tiles[t])
+            self._owned.add(t)
+        self._tiles[t][((i & _TILE_MASK) << _TILE_BITS) | (j & _TILE_MASK)] = value
+
+    def snapshot(self) -> BoardSnapshot:
+        """
+        Return the current state in O(1), later writes copy the tiles they touch
+
+        :return: The snapshot
+        """
+        self._owns_tiles = False
+        self._owned = set()
+        return BoardSnapshot(self.height, self.width, self._tiles)
+
+    def restore(self, snapshot: BoardSnapshot) -> None:
+        """
+        Set the state back to a snapshot, in O(1)
+
+        :param snapshot: Snapshot of the same board
+        """
+        self._tiles = snapshot._tiles
+        self._owns_tiles = False
+        self._owned = set()
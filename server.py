@@ -0,0 +1,621 @@
+"""
+Asyncio game server hosting many independent Minesweeper sessions.
+
+The protocol is line delimited JSON, each request is a single JSON object on its own line
+and gets exactly one JSON object line as a response, in order:
+
+    {"id": 1, "op": "new", "difficulty": "Easy"}
+    {"id": 1, "ok": true, "session": "...", "height": 8, "width": 10, "bombs": 10}
+    {"id": 2, "op": "reveal", "session": "...", "i": 3, "j": 4}
+    {"id": 2, "ok": true, "status": "playing", "changes": [[3, 4, "revealed", 1]], ...}
+
+Supported ops are new, reveal, flag, undo, state, close and stats.
+"""
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Any, Optional
+
+from constants import (DEFAULT_MAX_RESIDENT_CELLS, DEFAULT_MAX_PENDING_REQUESTS, DEFAULT_MAX_SESSION_CELLS,
+                       DEFAULT_SNAPSHOT_DIR)
+from controller import Controller
+from grid import Grid
+from headless import DirtyView
+from model import Model
+from persistent import BoardSnapshot
+from utils import BoardState, Difficulty, str_to_difficulty_enum
+
+# Snapshot header: version, status, height, width, bombs, seed, bombs_left, squares_revealed,
+# undos_remaining, memento_instances, history length, init_time, difficulty string length
+_SNAPSHOT_HEADER = struct.Struct('<BBIIIQiIiIIdB')
+_SNAPSHOT_VERSION = 1
+# Header of every undo history entry: squares_revealed, bombs_left
+_STATE_HEADER = struct.Struct('<Ii')
+
+# Bits used to pack a single cell into one byte
+_BOMB_BIT = 0x01
+_REVEALED_BIT = 0x02
+_FLAGGED_BIT = 0x04
+# Translation tables between BoardSnapshot values and the cell bits above
+_STATE_TO_CELL = bytes((value << 1) & 0xFF for value in range(256))
+_CELL_TO_STATE = bytes(value >> 1 for value in range(256))
+
+
+class HeadlessView(DirtyView):
+    """
+    View without a display, used to drive the Controller from the server.
+    Instead of a board of widgets, the final state of every updated square is sent to the client.
+    """
+
+    def __init__(self, model: Model) -> None:
+        super().__init__(model)
+        # The client gets the size of the board with the session, there is nothing to reset
+        self.all_dirty = False
+
+    def pop_changes(self) -> list[list[Any]]:
+        """
+        Return the changes since the last call and clear them
+
+        :return: List of [i, j, kind, value] changes, a single reset change when the whole board changed
+        """
+        if self.all_dirty:
+            self.dirty = set()
+            self.all_dirty = False
+            return [[None, None, 'reset', None]]
+        return [self.change(i, j) for (i, j) in sorted(self.pop_dirty())]
+
+    def change(self, i: int, j: int) -> list[Any]:
+        """
+        Return the change showing the current state of the (i, j) square
+
+        :param i: Height location of the cell
+        :param j: Width location of the cell
+        :return: [i, j, kind, value] change
+        """
+        cell = self.model.grid.board[i][j]
+        if (i, j) in self.bombs_shown:
+            return [i, j, 'bomb', None]
+        if cell.is_revealed:
+            return [i, j, 'revealed', cell.bombs_around]
+        if cell.is_flagged:
+            return [i, j, 'flag', None]
+        return [i, j, 'unflag', None]
+
+
+class SessionController(Controller):
+    """
+    Controller of a single server session, game over dialogs are replaced by a status
+    """
+
+    STATUSES = ('playing', 'won', 'lost')
+    PLAYING, WON, LOST = STATUSES
+
+    def __init__(self, model: Model, view: HeadlessView) -> None:
+        super().__init__(model, view)
+        self.status = self.PLAYING
+
+    def win_game(self) -> None:
+        self.status = self.WON
+
+    def lose_game(self) -> None:
+        self.reveal_all_bombs()
+        self.status = self.LOST
+
+    def start_new_game(self, seed: Optional[int] = None) -> None:
+        super().start_new_game(seed)
+        self.status = self.PLAYING
+
+    def undo_state(self) -> None:
+        if self.model.undo_state():
+            self.view.board_to_state(self.model.get_state())
+            self.status = self.PLAYING
+
+    def get_visible_rows(self) -> list[str]:
+        """
+        Return the visible board, one string per row.
+        '.' is hidden, 'F' is flagged, '*' is a revealed mine and digits are revealed squares
+
+        :return: List of rows
+        """
+        rows = []
+        for line in self.model.grid.board:
+            row = []
+            for cell in line:
+                if cell.is_flagged:
+                    row.append('F')
+                elif not cell.is_revealed:
+                    row.append('.')
+                elif cell.is_bomb:
+                    row.append('*')
+                else:
+                    row.append(str(cell.bombs_around))
+            rows.append(''.join(row))
+        return rows
+
+
+def new_session(difficulty: Difficulty = Difficulty.EASY, *argv) -> SessionController:
+    """
+    Create a new headless game session
+
+    :param difficulty: Enum of Difficulty
+    :param argv: height, width, bombs for a custom difficulty
+    :return: Controller of the new session
+    :raises ValueError: if parameters are invalid
+    """
+    model = Model()
+    if not model.set_parameters(difficulty, *argv):
+        raise ValueError("Invalid game parameters")
+    model.new_game()
+    view = HeadlessView(model)
+    controller = SessionController(model, view)
+    view.set_controller(controller)
+    return controller
+
+
+def dump_session(controller: SessionController) -> bytes:
+    """
+    Pack a session into a compact compressed snapshot, one byte per cell
+
+    :param controller: Session to pack
+    :return: Snapshot bytes
+    """
+    model = controller.model
+    grid = model.grid
+    cells = bytearray(grid.visible.to_bytes().translate(_STATE_TO_CELL))
+    for k in grid.mines:
+        cells[k] |= _BOMB_BIT
+    mementos = model.caretaker.get_history()
+    history = b''.join(_pack_board_state(memento.get_saved_state()) for memento in mementos)
+    difficulty = model.difficulty.value.encode()
+    header = _SNAPSHOT_HEADER.pack(_SNAPSHOT_VERSION, SessionController.STATUSES.index(controller.status),
+                                   grid.height, grid.width, grid.bombs, grid.seed, grid.bombs_left,
+                                   grid.squares_revealed, model.undos_remaining, model.memento_instances,
+                                   len(mementos), model.init_time, len(difficulty))
+    return zlib.compress(header + difficulty + bytes(cells) + history)
+
+
+def load_session(data: bytes) -> SessionController:
+    """
+    Rebuild a session from a snapshot made by dump_session
+
+    :param data: Snapshot bytes
+    :return: Controller of the restored session
+    :raises ValueError: if the snapshot version is unknown
+    """
+    data = zlib.decompress(data)
+    (version, status, height, width, bombs, seed, bombs_left, squares_revealed, undos_remaining,
+     memento_instances, history_len, init_time, difficulty_len) = _SNAPSHOT_HEADER.unpack_from(data)
+    if version != _SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    offset = _SNAPSHOT_HEADER.size
+    difficulty = data[offset:offset + difficulty_len].decode()
+    offset += difficulty_len
+    size = height * width
+    cells = data[offset:offset + size]
+    offset += size
+
+    grid = Grid(width, height, bombs, mine=False)
+    grid.place_bombs([(k // width, k % width) for k in range(size) if cells[k] & _BOMB_BIT])
+    for k in range(size):
+        if cells[k] & _REVEALED_BIT:
+            grid.reveal(k // width, k % width)
+        if cells[k] & _FLAGGED_BIT:
+            grid.set_flagged(k // width, k % width, True)
+    grid.seed = seed
+    grid.bombs_left = bombs_left
+    grid.squares_revealed = squares_revealed
+
+    model = Model()
+    model.grid = grid
+    model.difficulty = str_to_difficulty_enum(difficulty)
+    model.set_init_time(init_time)
+    model.undos_remaining = undos_remaining
+    model.memento_instances = memento_instances
+    state_size = _STATE_HEADER.size + size
+    for _ in range(history_len):
+        model.originator.set(_unpack_board_state(data[offset:offset + state_size], height, width))
+        model.caretaker.backup()
+        offset += state_size
+    model.state = grid.get_state()
+
+    view = HeadlessView(model)
+    controller = SessionController(model, view)
+    controller.status = SessionController.STATUSES[status]
+    view.set_controller(controller)
+    return controller
+
+
+def _pack_board_state(state: BoardState) -> bytes:
+    # Snapshot values use the revealed/flagged bits of a cell shifted by one
+    cells = state.grid_state.to_bytes().translate(_STATE_TO_CELL)
+    return _STATE_HEADER.pack(state.squares_revealed, state.bombs_left) + cells
+
+
+def _unpack_board_state(data: bytes, height: int, width: int) -> BoardState:
+    squares_revealed, bombs_left = _STATE_HEADER.unpack_from(data)
+    cells = data[_STATE_HEADER.size:].translate(_CELL_TO_STATE)
+    return BoardState(grid_state=BoardSnapshot.from_bytes(height, width, cells),
+                      squares_revealed=squares_revealed, bombs_left=bombs_left)
+
+
+class SessionStore:
+    """
+    Holds the game sessions of the server.
+    Sessions are kept in least recently used order, when the cells of all resident sessions
+    exceed the memory budget, the least recently used ones are evicted to snapshots on disk
+    and loaded back on their next request.
+    """
+
+    def __init__(self, snapshot_dir: str = DEFAULT_SNAPSHOT_DIR,
+                 max_resident_cells: int = DEFAULT_MAX_RESIDENT_CELLS) -> None:
+        """
+        :param snapshot_dir: Directory to write evicted sessions to, sessions already in it are kept
+        :param max_resident_cells: Memory budget, in cells, of the resident sessions
+        """
+        self.snapshot_dir = snapshot_dir
+        self.max_resident_cells = max_resident_cells
+        self.resident = OrderedDict()
+        self.resident_cells = 0
+        self.evicted = set()
+        # Snapshots of evicted sessions not written to disk yet, by session id
+        self.pending = {}
+        self._flush_lock = asyncio.Lock()
+        self.evictions = 0
+        self.loads = 0
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        # Sessions evicted by a previous run of the server can be loaded again
+        for name in os.listdir(self.snapshot_dir):
+            if name.endswith('.snap'):
+                self.evicted.add(name[:-len('.snap')])
+
+    def create(self, difficulty: Difficulty, *argv) -> tuple[str, SessionController]:
+        """
+        Create a new session
+
+        :param difficulty: Enum of Difficulty
+        :param argv: height, width, bombs for a custom difficulty
+        :return: Tuple of the session id and its controller
+        """
+        session = new_session(difficulty, *argv)
+        session_id = uuid.uuid4().hex
+        self._add(session_id, session)
+        return session_id, session
+
+    def get(self, session_id: str) -> SessionController:
+        """
+        Return a session, loading it back from disk if it was evicted
+
+        :param session_id: Id of the session
+        :return: Controller of the session
+        :raises KeyError: if there is no such session
+        """
+        session = self.resident.get(session_id)
+        if session is not None:
+            self.resident.move_to_end(session_id)
+            return session
+        if session_id not in self.evicted:
+            raise KeyError(session_id)
+        data = self.pending.pop(session_id, None)
+        if data is None:
+            path = self._snapshot_path(session_id)
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.remove(path)
+        session = load_session(data)
+        self.evicted.discard(session_id)
+        self.loads += 1
+        self._add(session_id, session)
+        return session
+
+    def close(self, session_id: str) -> None:
+        """
+        Remove a session from memory and from disk
+
+        :param session_id: Id of the session
+        :raises KeyError: if there is no such session
+        """
+        session = self.resident.pop(session_id, None)
+        if session is not None:
+            self.resident_cells -= _session_cells(session)
+        elif session_id in self.evicted:
+            self.evicted.discard(session_id)
+            if self.pending.pop(session_id, None) is None:
+                os.remove(self._snapshot_path(session_id))
+        else:
+            raise KeyError(session_id)
+
+    def resize(self, session_id: str, old_cells: int) -> None:
+        """
+        Account for a session whose board size changed
+
+        :param session_id: Id of the session
+        :param old_cells: Number of cells of the session before the change
+        """
+        self.resident_cells += _session_cells(self.resident[session_id]) - old_cells
+        self._evict()
+
+    def __len__(self) -> int:
+        return len(self.resident) + len(self.evicted)
+
+    def get_stats(self) -> dict[str, int]:
+        return {'sessions': len(self), 'resident': len(self.resident), 'resident_cells': self.resident_cells,
+                'evicted': len(self.evicted), 'pending_writes': len(self.pending), 'evictions': self.evictions,
+                'loads': self.loads}
+
+    def _add(self, session_id: str, session: SessionController) -> None:
+        self.resident[session_id] = session
+        self.resident_cells += _session_cells(session)
+        self._evict()
+
+    def _evict(self) -> None:
+        # The most recently used session always stays resident, it is the one being served
+        while self.resident_cells > self.max_resident_cells and len(self.resident) > 1:
+            session_id, session = self.resident.popitem(last=False)
+            self.resident_cells -= _session_cells(session)
+            # Written to disk by flush, out of the event loop
+            self.pending[session_id] = dump_session(session)
+            self.evicted.add(session_id)
+            self.evictions += 1
+
+    async def flush(self) -> None:
+        """
+        Write the snapshots of the evicted sessions to disk, in the default executor.
+        Sessions loaded back or closed during a write have their file removed once it's written.
+        """
+        loop = asyncio.get_running_loop()
+        async with self._flush_lock:
+            for session_id, data in list(self.pending.items()):
+                path = self._snapshot_path(session_id)
+                await loop.run_in_executor(None, _write_file, path, data)
+                if self.pending.get(session_id) is data:
+                    del self.pending[session_id]
+                elif session_id not in self.evicted:
+                    await loop.run_in_executor(None, os.remove, path)
+
+    def _snapshot_path(self, session_id: str) -> str:
+        return os.path.join(self.snapshot_dir, session_id + '.snap')
+
+
+def _write_file(path: str, data: bytes) -> None:
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _session_cells(session: SessionController) -> int:
+    """ Memory weight of a session: its cells, plus an upper bound of its undo snapshots """
+    return session.model.get_height() * session.model.get_width() * (1 + session.model.get_memento_instances())
+
+
+class GameServer:
+    """ Line delimited JSON protocol on top of a SessionStore """
+
+    def __init__(self, store: SessionStore, max_pending: int = DEFAULT_MAX_PENDING_REQUESTS,
+                 max_session_cells: int = DEFAULT_MAX_SESSION_CELLS) -> None:
+        """
+        :param store: Sessions of the server
+        :param max_pending: Requests read ahead from a single connection before reading pauses
+        :param max_session_cells: Largest board, in cells, a session may be created with
+        """
+        self.store = store
+        self.max_pending = max_pending
+        self.max_session_cells = max_session_cells
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serve a single client connection.
+        Requests are read into a bounded queue, once it is full reading stops until the responses
+        are written and drained, so a fast client is slowed down to the pace of the server.
+
+        :param reader: Stream of the incoming requests
+        :param writer: Stream of the outgoing responses
+        """
+        queue = asyncio.Queue(maxsize=self.max_pending)
+        worker = asyncio.create_task(self._respond(queue, writer))
+        worker.add_done_callback(lambda task: self._worker_done(task, writer))
+        try:
+            while not worker.done():
+                line = await reader.readline()
+                if not line or not await self._put(queue, line, worker):
+                    break
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            if not worker.done() and await self._put(queue, None, worker):
+                await worker
+            writer.close()
+
+    @staticmethod
+    async def _put(queue: asyncio.Queue, item: Optional[bytes], worker: asyncio.Task) -> bool:
+        """
+        Queue an item for the worker, waiting for room unless the worker stops
+
+        :return: False if the worker stopped before the item was queued
+        """
+        if not queue.full():
+            queue.put_nowait(item)
+            return True
+        put = asyncio.ensure_future(queue.put(item))
+        await asyncio.wait((put, worker), return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            return False
+        return True
+
+    @staticmethod
+    def _worker_done(task: asyncio.Task, writer: asyncio.StreamWriter) -> None:
+        # A worker which died can't answer anymore, closing the connection ends the reads
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Connection worker failed: {task.exception()!r}", file=sys.stderr)
+            writer.close()
+
+    async def _respond(self, queue: asyncio.Queue, writer: asyncio.StreamWriter) -> None:
+        while True:
+            line = await queue.get()
+            if line is None:
+                return
+            writer.write(json.dumps(self.handle_line(line), separators=(',', ':')).encode() + b'\n')
+            if self.store.pending:
+                await self.store.flush()
+            try:
+                await writer.drain()
+            except ConnectionError:
+                return
+
+    def handle_line(self, line: bytes) -> dict[str, Any]:
+        """
+        Handle a single request line
+
+        :param line: JSON encoded request
+        :return: Response object
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {'ok': False, 'error': 'invalid JSON'}
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': 'request must be an object'}
+        try:
+            response = self.handle_request(request)
+        except KeyError as e:
+            response = {'ok': False, 'error': f'unknown session {e}'}
+        except (ValueError, TypeError) as e:
+            response = {'ok': False, 'error': str(e)}
+        except Exception as e:
+            # Any other failure, such as a disk or memory error, only fails this request
+            response = {'ok': False, 'error': f'internal error: {e!r}'}
+        if 'id' in request:
+            response['id'] = request['id']
+        return response
+
+    def handle_request(self, request: dict[str, Any]) -> dict[str, Any]:
+        """
+        Handle a decoded request
+
+        :param request: Request object
+        :return: Response object
+        :raises KeyError: if the session is unknown
+        :raises ValueError: if the request is invalid
+        """
+        op = request.get('op')
+        if op == 'new':
+            return self._new(request)
+        if op == 'stats':
+            return {'ok': True, **self.store.get_stats()}
+
+        session_id = request.get('session')
+        if op == 'close':
+            self.store.close(session_id)
+            return {'ok': True}
+        session = self.store.get(session_id)
+        if op == 'state':
+            return self._result(session, rows=session.get_visible_rows())
+        elif op == 'undo':
+            old_cells = _session_cells(session)
+            if session.model.get_memento_instances() > 0:
+                session.undo_state()
+            self.store.resize(session_id, old_cells)
+            return self._result(session, rows=session.get_visible_rows())
+        elif op in ('reveal', 'flag', 'chord'):
+            i, j = self._location(session, request)
+            if session.status != session.PLAYING:
+                raise ValueError(f'game is {session.status}')
+            old_cells = _session_cells(session)
+            if op == 'reveal':
+                session.left_handler(i, j)
+            elif op == 'chord':
+                session.chord_handler(i, j)
+            else:
+                session.right_handler(i, j)
+            self.store.resize(session_id, old_cells)
+            return self._result(session)
+        raise ValueError(f'unknown op {op!r}')
+
+    def _new(self, request: dict[str, Any]) -> dict[str, Any]:
+        difficulty = str_to_difficulty_enum(request.get('difficulty', Difficulty.DEFAULT.value))
+        if difficulty is None:
+            raise ValueError('unknown difficulty')
+        argv = ()
+        if difficulty == Difficulty.CUSTOM:
+            argv = (request.get('height'), request.get('width'), request.get('bombs'))
+            if not all(isinstance(value, int) for value in argv):
+                raise ValueError('height, width and bombs must be integers')
+            # A board is allocated at once and may not fit the memory budget, so its size is capped
+            if argv[0] * argv[1] > self.max_session_cells:
+                raise ValueError(f'board is larger than {self.max_session_cells} cells')
+        session_id = request.get('session')
+        if session_id is None:
+            session_id, session = self.store.create(difficulty, *argv)
+        else:
+            # Restart an existing session
+            session = self.store.get(session_id)
+            old_cells = _session_cells(session)
+            if not session.model.set_parameters(difficulty, *argv):
+                raise ValueError('Invalid game parameters')
+            session.start_new_game()
+            session.view.pop_changes()
+            self.store.resize(session_id, old_cells)
+        return {'ok': True, 'session': session_id, 'height': session.get_board_height(),
+                'width': session.get_board_width(), 'bombs': session.model.get_bombs()}
+
+    @staticmethod
+    def _location(session: SessionController, request: dict[str, Any]) -> tuple[int, int]:
+        i, j = request.get('i'), request.get('j')
+        if not isinstance(i, int) or not isinstance(j, int) \
+                or not 0 <= i < session.get_board_height() or not 0 <= j < session.get_board_width():
+            raise ValueError('invalid cell location')
+        return i, j
+
+    @staticmethod
+    def _result(session: SessionController, **kwargs) -> dict[str, Any]:
+        return {'ok': True, 'status': session.status, 'bombs_left': session.get_bombs_left(),
+                'undos_remaining': session.get_undos_remaining(), 'changes': session.view.pop_changes(), **kwargs}
+
+
+async def start_server(server: GameServer, host: Optional[str] = None, port: int = 0,
+                       path: Optional[str] = None) -> asyncio.AbstractServer:
+    """
+    Start listening on a TCP port or on a Unix socket
+
+    :param server: Game server to serve connections with
+    :param host: Host to listen on
+    :param port: TCP port to listen on, 0 picks a free port
+    :param path: Unix socket path, used instead of TCP when given
+    :return: The listening asyncio server
+    """
+    if path is not None:
+        return await asyncio.start_unix_server(server.handle_connection, path=path)
+    return await asyncio.start_server(server.handle_connection, host=host, port=port)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    store = SessionStore(args.snapshot_dir, args.max_cells)
+    server = GameServer(store, args.max_pending, args.max_session_cells)
+    listener = await start_server(server, args.host, args.port, args.unix)
+    for sock in listener.sockets:
+        print(f"Serving on {sock.getsockname()}")
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Minesweeper multi-session game server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="Unix socket path, used instead of TCP")
+    parser.add_argument('--snapshot-dir', default=DEFAULT_SNAPSHOT_DIR)
+    parser.add_argument('--max-cells', type=int, default=DEFAULT_MAX_RESIDENT_CELLS,
+                        help="Cells kept in memory before idle sessions are evicted to disk")
+    parser.add_argument('--max-session-cells', type=int, default=DEFAULT_MAX_SESSION_CELLS,
+                        help="Largest board, in cells, a session may be created with")
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING_REQUESTS,
+                        help="Requests read ahead from a connection before reading pauses")
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
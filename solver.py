@@ -0,0 +1,80 @@
+"""
+Solver of the autoplay mode and of the memory reports.
+
+It only reads what a player sees of a grid and has no GUI dependency, so it runs headless.
+"""
+import random
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from grid import Grid
+
+if TYPE_CHECKING:
+    from autoplay import AutoplayController
+
+
+class Solver:
+    """
+    Plays from what a player sees: chords satisfied numbers, flags squares which must be bombs,
+    and guesses a hidden square when nothing is certain
+    """
+
+    def __init__(self, seed: Optional[int] = None) -> None:
+        """
+        :param seed: Seed of the guesses
+        """
+        self.random = random.Random(seed)
+
+    def next_moves(self, grid: Grid) -> list[tuple[str, int, int]]:
+        """
+        Return the moves deduced from the visible board, or a single guess
+
+        :param grid: Grid being played
+        :return: List of (op, i, j) moves
+        """
+        if grid.squares_revealed == 0:
+            return [('reveal', grid.height // 2, grid.width // 2)]
+        moves = []
+        flagged = set()
+        hidden = []
+        for line in grid.board:
+            for cell in line:
+                if not cell.is_revealed:
+                    if not cell.is_flagged:
+                        hidden.append(cell)
+                    continue
+                if cell.bombs_around == 0 or cell.is_bomb:
+                    continue
+                neighbours = [grid.board[x][y] for (x, y) in grid.get_neighbours(cell.x, cell.y)
+                              if (x, y) != (cell.x, cell.y)]
+                flags = sum(neighbour.is_flagged or (neighbour.x, neighbour.y) in flagged
+                            for neighbour in neighbours)
+                unknown = [neighbour for neighbour in neighbours if not neighbour.is_revealed
+                           and not neighbour.is_flagged and (neighbour.x, neighbour.y) not in flagged]
+                if not unknown:
+                    continue
+                if flags == cell.bombs_around:
+                    moves.append(('chord', cell.x, cell.y))
+                elif flags + len(unknown) == cell.bombs_around:
+                    for neighbour in unknown:
+                        flagged.add((neighbour.x, neighbour.y))
+                        moves.append(('flag', neighbour.x, neighbour.y))
+        if not moves and hidden:
+            guess = self.random.choice(hidden)
+            moves.append(('reveal', guess.x, guess.y))
+        return moves
+
+    def moves(self, controller: 'AutoplayController') -> Iterator[tuple[str, int, int]]:
+        """
+        Yield moves until the game is over
+
+        :param controller: Controller of the game being played
+        :return: Iterator of (op, i, j) moves
+        """
+        while not controller.game_over:
+            for move in self.next_moves(controller.model.grid):
+                if controller.game_over:
+                    return
+                # A chord earlier in the batch may already have revealed the square
+                if move[0] == 'flag' and controller.model.grid.board[move[1]][move[2]].is_revealed:
+                    continue
+                yield move
@@ -0,0 +1,77 @@
+"""
+Measure the cold start of the GUI for every preset.
+
+Each preset is started in a fresh interpreter, from which two times are reported:
+the first paint of the window and the first interactive frame, once the board is complete
+and drawn. Needs a display, e.g. `xvfb-run python startup_time.py`.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from utils import Difficulty
+
+# Presets started by default, custom boards would prompt for their size
+PRESETS = [Difficulty.EASY, Difficulty.MEDIUM, Difficulty.HARD]
+
+
+def child(difficulty: Difficulty) -> None:
+    """ Start the game, print the times of the first paint and first interactive frame, and quit """
+    import tkinter as tk
+    from main import create_game
+
+    times = {}
+
+    def _ready() -> None:
+        view.window.update()
+        times['interactive'] = time.time()
+        view.window.destroy()
+
+    view, _ = create_game(difficulty, on_ready=_ready)
+    # create_game painted the empty window before building anything else
+    times['first_paint'] = view.first_paint_time
+    tk.mainloop()
+    print(json.dumps(times))
+
+
+def measure(difficulty: Difficulty, runs: int) -> dict:
+    """
+    Start the game in fresh interpreters and report the fastest run
+
+    :param difficulty: Enum of Difficulty to start with
+    :param runs: Number of runs
+    :return: Dictionary of the first paint and interactive times in milliseconds
+    """
+    results = []
+    for _ in range(runs):
+        start = time.time()
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', difficulty.value],
+                                capture_output=True, text=True, check=True).stdout
+        times = json.loads(output.strip().splitlines()[-1])
+        results.append({key: (value - start) * 1000 for key, value in times.items()})
+    return {'first_paint_ms': round(min(result['first_paint'] for result in results), 1),
+            'interactive_ms': round(min(result['interactive'] for result in results), 1), 'runs': runs}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure time to first interactive frame of the GUI")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help="Path to write the results to as JSON")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(Difficulty(args.child))
+        sys.exit()
+
+    report = {}
+    for preset in PRESETS:
+        report[preset.value] = measure(preset, args.runs)
+        print(f"{preset.value:<8} first paint {report[preset.value]['first_paint_ms']:>8.1f} ms   "
+              f"interactive {report[preset.value]['interactive_ms']:>8.1f} ms")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
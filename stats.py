@@ -0,0 +1,258 @@
+"""
+Persistent game statistics, stored in a local SQLite database in WAL mode.
+
+Results from the GUI are buffered and written in batches, simulation runs can stream
+their results in with ingest (or `python stats.py ingest results.jsonl`).
+Per preset totals are kept up to date on every write, so win rates are read without
+scanning the games table, and leaderboards are served from an index.
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass, field, asdict
+from itertools import islice
+from typing import Iterable, Optional
+
+from constants import DEFAULT_STATS_PATH, DEFAULT_STATS_BATCH_SIZE, DEFAULT_STATS_INGEST_CHUNK
+from utils import Difficulty
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    played_at REAL NOT NULL,
+    difficulty TEXT NOT NULL,
+    height INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    bombs INTEGER NOT NULL,
+    seed INTEGER,
+    duration REAL NOT NULL,
+    clicks INTEGER NOT NULL,
+    undos_used INTEGER NOT NULL,
+    won INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_leaderboard ON games (difficulty, height, width, bombs, won, duration);
+CREATE TABLE IF NOT EXISTS preset_totals (
+    difficulty TEXT NOT NULL,
+    height INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    bombs INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    PRIMARY KEY (difficulty, height, width, bombs)
+);
+"""
+
+# Columns of the leaderboard index, an index from an older database is rebuilt when they differ
+_LEADERBOARD_COLUMNS = ['difficulty', 'height', 'width', 'bombs', 'won', 'duration']
+
+_INSERT_GAME = """
+INSERT INTO games (played_at, difficulty, height, width, bombs, seed, duration, clicks, undos_used, won)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_UPDATE_TOTALS = """
+INSERT INTO preset_totals (difficulty, height, width, bombs, games, wins) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (difficulty, height, width, bombs)
+DO UPDATE SET games = games + excluded.games, wins = wins + excluded.wins
+"""
+
+
+@dataclass
+class GameResult:
+    difficulty: str
+    height: int
+    width: int
+    bombs: int
+    seed: Optional[int]
+    duration: float
+    clicks: int
+    undos_used: int
+    won: bool
+    played_at: float = field(default_factory=time.time)
+
+
+def result_from_model(model, won: bool, ended_at: Optional[float] = None) -> GameResult:
+    """
+    Create the result of the game currently held by a model
+
+    :param model: Model of the finished game
+    :param won: Whether the game was won
+    :param ended_at: Time the game ended, now if not given
+    :return: Result of the game
+    """
+    if ended_at is None:
+        ended_at = time.time()
+    return GameResult(difficulty=model.difficulty.value, height=model.get_height(), width=model.get_width(),
+                      bombs=model.get_bombs(), seed=model.get_seed(),
+                      duration=ended_at - model.get_init_time(), clicks=model.get_clicks(),
+                      undos_used=model.get_undos_used(), won=won, played_at=ended_at)
+
+
+class StatsStore:
+    """ SQLite backed store of game results """
+
+    def __init__(self, path: str = DEFAULT_STATS_PATH, batch_size: int = DEFAULT_STATS_BATCH_SIZE) -> None:
+        """
+        :param path: Path of the database file
+        :param batch_size: Number of recorded results buffered before they are written
+        """
+        self.batch_size = batch_size
+        self.pending = []
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # WAL mode stays consistent with NORMAL, only the last commits may be lost on power failure
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[2] for row in self.connection.execute("PRAGMA index_info(games_leaderboard)")]
+        if columns and columns != _LEADERBOARD_COLUMNS:
+            self.connection.execute("DROP INDEX games_leaderboard")
+        self.connection.executescript(_SCHEMA)
+
+    def record(self, result: GameResult) -> None:
+        """
+        Buffer a game result, the buffer is written once it holds batch_size results
+
+        :param result: Result to record
+        """
+        self.pending.append(result)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """ Write all buffered results """
+        if self.pending:
+            self._write(self.pending)
+            self.pending = []
+
+    def ingest(self, results: Iterable[GameResult], chunk_size: int = DEFAULT_STATS_INGEST_CHUNK) -> int:
+        """
+        Write a stream of results, one transaction per chunk
+
+        :param results: Results to write, consumed lazily
+        :param chunk_size: Number of results written per transaction
+        :return: Number of results written
+        """
+        count = 0
+        results = iter(results)
+        while True:
+            chunk = list(islice(results, chunk_size))
+            if not chunk:
+                return count
+            self._write(chunk)
+            count += len(chunk)
+
+    def ingest_jsonl(self, lines: Iterable[str], chunk_size: int = DEFAULT_STATS_INGEST_CHUNK) -> int:
+        """
+        Write results from JSON lines, each holding the fields of a GameResult
+
+        :param lines: JSON lines, blank lines are skipped
+        :param chunk_size: Number of results written per transaction
+        :return: Number of results written
+        """
+        return self.ingest((GameResult(**json.loads(line)) for line in lines if line.strip()), chunk_size)
+
+    def leaderboard(self, difficulty: Difficulty, limit: int = 10,
+                    size: Optional[tuple[int, int, int]] = None) -> list[GameResult]:
+        """
+        Return the fastest won games of a difficulty, on a single board size.
+        The size can be left out when all games of the difficulty were played on the same board,
+        as with the presets.
+
+        :param difficulty: Enum of Difficulty
+        :param limit: Maximum number of games to return
+        :param size: height, width, bombs of the board
+        :return: List of results, fastest first
+        :raises ValueError: if no size is given and games of the difficulty were played on several boards
+        """
+        self.flush()
+        if size is None:
+            sizes = self.connection.execute(
+                "SELECT height, width, bombs FROM preset_totals WHERE difficulty = ?", (difficulty.value,)).fetchall()
+            if not sizes:
+                return []
+            if len(sizes) > 1:
+                raise ValueError(f"{difficulty.value} games were played on {len(sizes)} boards, give a size")
+            size = sizes[0]
+        rows = self.connection.execute(
+            "SELECT played_at, difficulty, height, width, bombs, seed, duration, clicks, undos_used, won "
+            "FROM games WHERE difficulty = ? AND height = ? AND width = ? AND bombs = ? AND won = 1 "
+            "ORDER BY duration LIMIT ?",
+            (difficulty.value, *size, limit))
+        return [GameResult(played_at=row[0], difficulty=row[1], height=row[2], width=row[3], bombs=row[4],
+                           seed=row[5], duration=row[6], clicks=row[7], undos_used=row[8], won=bool(row[9]))
+                for row in rows]
+
+    def win_rates(self) -> list[dict]:
+        """
+        Return the number of games, wins and win rate of every preset played.
+        Custom games are reported per board size and bombs count.
+
+        :return: List of dictionaries, one per preset
+        """
+        self.flush()
+        rows = self.connection.execute(
+            "SELECT difficulty, height, width, bombs, games, wins FROM preset_totals "
+            "ORDER BY difficulty, height, width, bombs")
+        return [{'difficulty': difficulty, 'height': height, 'width': width, 'bombs': bombs,
+                 'games': games, 'wins': wins, 'win_rate': wins / games if games else 0.0}
+                for (difficulty, height, width, bombs, games, wins) in rows]
+
+    def count(self) -> int:
+        """
+        Return the number of recorded games
+
+        :return: Number of games
+        """
+        self.flush()
+        return self.connection.execute("SELECT COALESCE(SUM(games), 0) FROM preset_totals").fetchone()[0]
+
+    def close(self) -> None:
+        """ Write buffered results and close the database """
+        self.flush()
+        self.connection.close()
+
+    def _write(self, results: list[GameResult]) -> None:
+        totals = {}
+        for result in results:
+            key = (result.difficulty, result.height, result.width, result.bombs)
+            games, wins = totals.get(key, (0, 0))
+            totals[key] = (games + 1, wins + int(result.won))
+        with self.connection:
+            # asdict deep copies every field, a plain tuple is much cheaper on bulk ingestion
+            self.connection.executemany(_INSERT_GAME, [
+                (result.played_at, result.difficulty, result.height, result.width, result.bombs, result.seed,
+                 result.duration, result.clicks, result.undos_used, int(result.won)) for result in results])
+            self.connection.executemany(_UPDATE_TOTALS, [key + value for key, value in totals.items()])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Minesweeper game statistics")
+    parser.add_argument('--db', default=DEFAULT_STATS_PATH, help="Path of the statistics database")
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = commands.add_parser('ingest', help="Ingest JSON lines results, '-' reads stdin")
+    ingest_parser.add_argument('file')
+    leaderboard_parser = commands.add_parser('leaderboard', help="Fastest won games of a difficulty")
+    leaderboard_parser.add_argument('difficulty', choices=[difficulty.value for difficulty in Difficulty])
+    leaderboard_parser.add_argument('--limit', type=int, default=10)
+    leaderboard_parser.add_argument('--size', type=int, nargs=3, metavar=('HEIGHT', 'WIDTH', 'BOMBS'),
+                                    help="Board of the games, needed when a difficulty was played on several")
+    commands.add_parser('winrate', help="Win rate of every preset")
+    args = parser.parse_args()
+
+    store = StatsStore(args.db)
+    try:
+        if args.command == 'ingest':
+            if args.file == '-':
+                print(store.ingest_jsonl(sys.stdin))
+            else:
+                with open(args.file) as f:
+                    print(store.ingest_jsonl(f))
+        elif args.command == 'leaderboard':
+            size = tuple(args.size) if args.size else None
+            print(json.dumps([asdict(result) for result in
+                              store.leaderboard(Difficulty(args.difficulty), args.limit, size)], indent=2))
+        elif args.command == 'winrate':
+            print(json.dumps(store.win_rates(), indent=2))
+    finally:
+        store.close()
@@ -0,0 +1,547 @@
+"""
+Terminal (curses) front end, for hosts without a display.
+
+It drives the same Model and Controller as the Tk front end. Instead of repainting the
+board, every frame only writes the squares and status fields which changed since the
+previous frame, which keeps latency and bandwidth low over SSH, even on large boards.
+
+    python terminal.py
+    python terminal.py --height 200 --width 200 --bombs 6000 --report report.json
+
+Keys: arrows/hjkl move, space/enter reveal, f flag, u undo, n new game, 1/2/3 difficulty, q quit.
+Left click reveals and right click flags.
+
+When run in a terminal, curses writes to a pseudo terminal relayed to the real one, so the bytes
+sent to the terminal by every move, escape sequences included, are counted in the report.
+"""
+import argparse
+import curses
+import fcntl
+import json
+import os
+import pty
+import select
+import signal
+import statistics
+import struct
+import termios
+import threading
+import time
+import tty
+from typing import Optional
+
+from controller import Controller
+from headless import DirtyView
+from model import Model
+from utils import Difficulty
+
+# Glyph of a square by state, numbers are shown as is
+HIDDEN = '.'
+FLAG = 'F'
+MINE = '*'
+EMPTY = ' '
+# Screen columns used by a square
+CELL_WIDTH = 2
+# Rows above the board, used by the status line
+BOARD_TOP = 2
+# Written after a frame to find where its bytes end in the relayed output, it never reaches the terminal
+MARK = b'\x1b]minesweeper-mark\x07'
+
+
+class OutputMeter:
+    """
+    Counts the bytes curses sends to the terminal.
+    Standard input and output are moved to a pseudo terminal, whose output is relayed to the real
+    terminal and counted, and the real terminal's input and size are relayed to it.
+    """
+
+    def __init__(self) -> None:
+        self.bytes_total = 0
+        self._marked_total = 0
+        self._marks_written = 0
+        self._marks_seen = 0
+        self._mark_totals = []
+        self._condition = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._resized = False
+        self._master = self._slave = self._stdin = self._stdout = None
+        self._attributes = None
+        self._sigwinch = None
+
+    def start(self) -> None:
+        """ Move standard input and output to the pseudo terminal and start relaying """
+        self._master, self._slave = pty.openpty()
+        self._stdin, self._stdout = os.dup(0), os.dup(1)
+        self._copy_size()
+        self._attributes = termios.tcgetattr(self._stdin)
+        # Keys go through as they are typed, the pseudo terminal handles them as curses sets it up
+        tty.setraw(self._stdin)
+        # Set before curses starts, so curses leaves SIGWINCH to it
+        self._sigwinch = signal.signal(signal.SIGWINCH, self._on_resize)
+        os.dup2(self._slave, 0)
+        os.dup2(self._slave, 1)
+        self._threads = [threading.Thread(target=self._relay_output, daemon=True),
+                         threading.Thread(target=self._relay_input, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """ Relay what is left of the output and give standard input and output back to the terminal """
+        self.mark()
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join()
+        os.dup2(self._stdin, 0)
+        os.dup2(self._stdout, 1)
+        termios.tcsetattr(self._stdin, termios.TCSAFLUSH, self._attributes)
+        signal.signal(signal.SIGWINCH, self._sigwinch)
+        for fd in (self._master, self._slave, self._stdin, self._stdout):
+            os.close(fd)
+
+    def mark(self) -> int:
+        """
+        Wait until the output written so far reached the terminal
+
+        :return: Number of bytes sent to the terminal since the previous mark
+        """
+        with self._condition:
+            self._marks_written += 1
+            mark = self._marks_written
+        os.write(1, MARK)
+        with self._condition:
+            self._condition.wait_for(lambda: self._marks_seen >= mark, timeout=1)
+            total = self._mark_totals[-1] if self._mark_totals else self.bytes_total
+            self._mark_totals = []
+        written = total - self._marked_total
+        self._marked_total = total
+        return written
+
+    def take_resize(self) -> Optional[tuple[int, int]]:
+        """
+        Return the new size of the terminal if it was resized since the last call
+
+        :return: Tuple of rows, columns, or None if it wasn't resized
+        """
+        if not self._resized:
+            return None
+        self._resized = False
+        rows, columns, _, _ = struct.unpack('hhhh', fcntl.ioctl(self._slave, termios.TIOCGWINSZ, bytes(8)))
+        return rows, columns
+
+    def _copy_size(self) -> None:
+        fcntl.ioctl(self._slave, termios.TIOCSWINSZ, fcntl.ioctl(self._stdout, termios.TIOCGWINSZ, bytes(8)))
+
+    def _on_resize(self, signum: int, frame) -> None:
+        self._copy_size()
+        self._resized = True
+
+    def _relay_output(self) -> None:
+        pending = b''
+        while not self._stopping.is_set():
+            if not select.select([self._master], [], [], 0.05)[0]:
+                continue
+            try:
+                data = pending + os.read(self._master, 65536)
+            except OSError:
+                return
+            with self._condition:
+                start = 0
+                k = data.find(MARK)
+                while k != -1:
+                    self._write(data[start:k])
+                    self._marks_seen += 1
+                    self._mark_totals.append(self.bytes_total)
+                    start = k + len(MARK)
+                    k = data.find(MARK, start)
+                # A mark may be cut by the end of the read, its beginning is kept for the next one
+                keep = next((n for n in range(min(len(MARK) - 1, len(data) - start), 0, -1)
+                             if data.endswith(MARK[:n])), 0)
+                self._write(data[start:len(data) - keep])
+                pending = data[len(data) - keep:]
+                self._condition.notify_all()
+
+    def _write(self, data: bytes) -> None:
+        self.bytes_total += len(data)
+        while data:
+            data = data[os.write(self._stdout, data):]
+
+    def _relay_input(self) -> None:
+        while not self._stopping.is_set():
+            if not select.select([self._stdin], [], [], 0.05)[0]:
+                continue
+            data = os.read(self._stdin, 1024)
+            if b'\x03' in data:
+                # The pseudo terminal isn't the controlling terminal, interrupt as the real one would
+                os.kill(os.getpid(), signal.SIGINT)
+            os.write(self._master, data)
+
+
+class TerminalView(DirtyView):
+    """
+    View drawing the board with curses.
+    Controller updates only mark squares as dirty, they are drawn once per frame by TerminalApp.draw().
+    """
+
+    def glyph(self, i: int, j: int) -> str:
+        """
+        Return the character showing the (i, j) square
+
+        :param i: Height location of the cell
+        :param j: Width location of the cell
+        :return: Single character
+        """
+        cell = self.model.grid.board[i][j]
+        if (i, j) in self.bombs_shown:
+            return MINE
+        if cell.is_flagged:
+            return FLAG
+        if not cell.is_revealed:
+            return HIDDEN
+        if cell.is_bomb:
+            return MINE
+        return str(cell.bombs_around) if cell.bombs_around else EMPTY
+
+
+class TerminalController(Controller):
+    """ Controller of the terminal front end, game over dialogs are replaced by a message """
+
+    def __init__(self, model: Model, view: TerminalView) -> None:
+        super().__init__(model, view)
+        self.message = ""
+        self.game_over = False
+
+    def win_game(self) -> None:
+        self.game_over = True
+        self.message = "You won! n: new game, q: quit"
+
+    def lose_game(self) -> None:
+        self.reveal_all_bombs()
+        self.game_over = True
+        if self.model.get_undos_remaining() > 0:
+            self.message = f"You lost... u: undo ({self.model.get_undos_remaining()} left), n: new game, q: quit"
+        else:
+            self.message = "You lost... n: new game, q: quit"
+
+    def start_new_game(self, seed: Optional[int] = None) -> None:
+        super().start_new_game(seed)
+        self.game_over = False
+        self.message = ""
+
+    def undo_state(self) -> None:
+        if self.model.undo_state():
+            self.view.board_to_state(self.model.get_state())
+            self.game_over = False
+            self.message = ""
+
+    def set_difficulty(self, difficulty: Difficulty, *argv) -> None:
+        """
+        Set difficulty and start a new game, custom sizes are given as height, width, bombs
+
+        :param difficulty: Enum representing difficulty
+        :param argv: height, width, bombs of a custom difficulty
+        """
+        if self.model.set_parameters(difficulty, *argv):
+            self.start_new_game()
+
+
+class TerminalApp:
+    """ Input loop and diff based drawing of the terminal front end """
+
+    # Color pair of every glyph, pairs are created in _init_colors
+    COLORS = {'1': 1, '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 7, FLAG: 3, MINE: 3}
+
+    def __init__(self, screen, controller: TerminalController, view: TerminalView,
+                 meter: Optional[OutputMeter] = None) -> None:
+        """
+        :param screen: Curses window of the whole screen
+        :param controller: Controller of the game
+        :param view: View of the game
+        :param meter: Meter of the bytes sent to the terminal, they are not reported if not given
+        """
+        self.screen = screen
+        self.controller = controller
+        self.view = view
+        self.meter = meter
+        self.cursor = (0, 0)
+        self.top = 0
+        self.left = 0
+        # What is currently on the screen: glyph by screen position, and the status line
+        self.drawn = {}
+        self.drawn_status = None
+        self.frame_times = []
+        self.frame_chars = []
+        self.frame_bytes = []
+        self._init_colors()
+
+    def _init_colors(self) -> None:
+        self.attributes = {}
+        if not curses.has_colors():
+            return
+        curses.start_color()
+        curses.use_default_colors()
+        for pair, color in enumerate((curses.COLOR_BLUE, curses.COLOR_GREEN, curses.COLOR_RED,
+                                      curses.COLOR_BLUE, curses.COLOR_MAGENTA, curses.COLOR_CYAN,
+                                      curses.COLOR_WHITE), start=1):
+            curses.init_pair(pair, color, -1)
+        self.attributes = {glyph: curses.color_pair(pair) for glyph, pair in self.COLORS.items()}
+        self.attributes[FLAG] |= curses.A_BOLD
+        self.attributes[MINE] |= curses.A_BOLD
+
+    def run(self) -> None:
+        """ Handle input until the player quits """
+        try:
+            curses.curs_set(1)
+        except curses.error:
+            # Terminal can't show a cursor
+            pass
+        curses.mousemask(curses.BUTTON1_CLICKED | curses.BUTTON1_PRESSED
+                         | curses.BUTTON2_CLICKED | curses.BUTTON2_PRESSED
+                         | curses.BUTTON3_CLICKED | curses.BUTTON3_PRESSED)
+        self.screen.keypad(True)
+        # Wake up every second to update the time counter
+        self.screen.timeout(1000)
+        self.draw()
+        while True:
+            key = self.screen.getch()
+            if key in (ord('q'), ord('Q')):
+                return
+            if self.meter is not None:
+                size = self.meter.take_resize()
+                if size:
+                    curses.resizeterm(*size)
+                    self.clear()
+                # Output of the previous frames, such as time counter updates, isn't counted in the move
+                self.meter.mark()
+            start = time.perf_counter()
+            moved = self.handle_key(key)
+            written = self.draw()
+            if moved:
+                self.frame_times.append(time.perf_counter() - start)
+                self.frame_chars.append(written)
+                if self.meter is not None:
+                    self.frame_bytes.append(self.meter.mark())
+
+    def handle_key(self, key: int) -> bool:
+        """
+        Handle a key press or mouse event
+
+        :param key: Key code returned by getch
+        :return: True if it was a move on the board
+        """
+        height = self.controller.get_board_height()
+        width = self.controller.get_board_width()
+        i, j = self.cursor
+        if key in (curses.KEY_UP, ord('k')):
+            self.cursor = (max(i - 1, 0), j)
+        elif key in (curses.KEY_DOWN, ord('j')):
+            self.cursor = (min(i + 1, height - 1), j)
+        elif key in (curses.KEY_LEFT, ord('h')):
+            self.cursor = (i, max(j - 1, 0))
+        elif key in (curses.KEY_RIGHT, ord('l')):
+            self.cursor = (i, min(j + 1, width - 1))
+        elif key in (ord(' '), ord('\n'), curses.KEY_ENTER):
+            return self.reveal(i, j)
+        elif key in (ord('f'), ord('F')):
+            return self.flag(i, j)
+        elif key in (ord('c'), ord('C')):
+            return self.chord(i, j)
+        elif key in (ord('u'), ord('U')):
+            self.controller.undo_state()
+            return True
+        elif key in (ord('n'), ord('N')):
+            self.controller.start_new_game()
+            return True
+        elif key in (ord('1'), ord('2'), ord('3')):
+            self.controller.set_difficulty((Difficulty.EASY, Difficulty.MEDIUM, Difficulty.HARD)[key - ord('1')])
+            self.cursor = (0, 0)
+            self.clear()
+            return True
+        elif key == curses.KEY_MOUSE:
+            return self.handle_mouse()
+        elif key == curses.KEY_RESIZE:
+            self.clear()
+        return False
+
+    def handle_mouse(self) -> bool:
+        try:
+            _, x, y, _, state = curses.getmouse()
+        except curses.error:
+            return False
+        i = y - BOARD_TOP + self.top
+        j = x // CELL_WIDTH + self.left
+        if not (0 <= i < self.controller.get_board_height() and 0 <= j < self.controller.get_board_width()):
+            return False
+        self.cursor = (i, j)
+        if state & (curses.BUTTON1_CLICKED | curses.BUTTON1_PRESSED):
+            return self.reveal(i, j)
+        if state & (curses.BUTTON2_CLICKED | curses.BUTTON2_PRESSED):
+            return self.chord(i, j)
+        if state & (curses.BUTTON3_CLICKED | curses.BUTTON3_PRESSED):
+            return self.flag(i, j)
+        return False
+
+    def reveal(self, i: int, j: int) -> bool:
+        if self.controller.game_over:
+            return False
+        if self.controller.is_square_revealed(i, j):
+            # Revealing a revealed number chords, it doesn't reveal anything otherwise
+            return self.controller.chord_handler(i, j)
+        self.controller.left_handler(i, j)
+        return True
+
+    def flag(self, i: int, j: int) -> bool:
+        if self.controller.game_over:
+            return False
+        self.controller.right_handler(i, j)
+        return True
+
+    def chord(self, i: int, j: int) -> bool:
+        if self.controller.game_over:
+            return False
+        return self.controller.chord_handler(i, j)
+
+    def clear(self) -> None:
+        """ Forget what is on the screen, the next frame draws everything """
+        self.screen.erase()
+        self.drawn = {}
+        self.drawn_status = None
+        self.view.all_dirty = True
+
+    def draw(self) -> int:
+        """
+        Draw a frame, writing only what changed since the previous one
+
+        :return: Number of characters drawn, squares and status line, not the bytes curses sends
+        """
+        rows, columns = self.screen.getmaxyx()
+        view_height = max(1, rows - BOARD_TOP)
+        view_width = max(1, columns // CELL_WIDTH)
+        height = self.controller.get_board_height()
+        width = self.controller.get_board_width()
+
+        # Scroll the viewport to keep the cursor visible
+        i, j = self.cursor
+        top = min(max(self.top, i - view_height + 1), i)
+        left = min(max(self.left, j - view_width + 1), j)
+        scrolled = (top, left) != (self.top, self.left)
+        self.top, self.left = top, left
+
+        if self.view.all_dirty or scrolled:
+            squares = ((x, y) for x in range(top, min(top + view_height, height))
+                       for y in range(left, min(left + view_width, width)))
+        else:
+            squares = (square for square in self.view.dirty
+                       if top <= square[0] < top + view_height and left <= square[1] < left + view_width)
+        written = 0
+        for (x, y) in squares:
+            glyph = self.view.glyph(x, y)
+            position = (x - top + BOARD_TOP, (y - left) * CELL_WIDTH)
+            if self.drawn.get(position) != glyph:
+                self._write(position[0], position[1], glyph, self.attributes.get(glyph, 0))
+                self.drawn[position] = glyph
+                written += 1
+        self.view.dirty.clear()
+        self.view.all_dirty = False
+
+        written += self.draw_status(columns)
+        self.screen.move(i - top + BOARD_TOP, (j - left) * CELL_WIDTH)
+        self.screen.refresh()
+        return written
+
+    def draw_status(self, columns: int) -> int:
+        """
+        Draw the status line if it changed
+
+        :param columns: Width of the screen
+        :return: Number of characters drawn
+        """
+        elapsed = int(time.time() - self.controller.get_init_time())
+        status = (f"Bombs {self.controller.get_bombs_left():>4}  Undos {self.controller.get_undos_remaining()}  "
+                  f"Time {elapsed:>4}  {self.controller.message}")[:columns - 1].ljust(columns - 1)
+        if status == self.drawn_status:
+            return 0
+        # Only the changed part of the line is written
+        previous = self.drawn_status or ''
+        start = 0
+        while start < len(previous) and start < len(status) and previous[start] == status[start]:
+            start += 1
+        end = len(status)
+        while end > start and end <= len(previous) and previous[end - 1] == status[end - 1]:
+            end -= 1
+        self._write(0, start, status[start:end], curses.A_REVERSE)
+        self.drawn_status = status
+        return end - start
+
+    def _write(self, row: int, column: int, text: str, attribute: int) -> None:
+        try:
+            self.screen.addstr(row, column, text, attribute)
+        except curses.error:
+            # Writing the bottom right corner moves the cursor out of the screen
+            pass
+
+    def get_report(self) -> dict:
+        """
+        Return frame time, characters drawn and bytes sent to the terminal per move
+
+        :return: JSON serializable dictionary
+        """
+        if not self.frame_times:
+            return {'moves': 0}
+        times = sorted(self.frame_times)
+        report = {'moves': len(times),
+                  'frame_ms_p50': round(statistics.median(times) * 1000, 3),
+                  'frame_ms_p99': round(times[min(len(times) - 1, int(len(times) * 0.99))] * 1000, 3),
+                  'frame_ms_max': round(times[-1] * 1000, 3),
+                  'chars_per_move_mean': round(statistics.mean(self.frame_chars), 1),
+                  'chars_per_move_max': max(self.frame_chars),
+                  'chars_total': sum(self.frame_chars)}
+        if self.frame_bytes:
+            report.update({'bytes_per_move_mean': round(statistics.mean(self.frame_bytes), 1),
+                           'bytes_per_move_max': max(self.frame_bytes),
+                           'bytes_total': sum(self.frame_bytes)})
+        return report
+
+
+def main(screen, difficulty: Difficulty, argv: tuple, meter: Optional[OutputMeter] = None) -> dict:
+    model = Model()
+    if not model.set_parameters(difficulty, *argv):
+        raise ValueError("Invalid game parameters")
+    model.new_game()
+    view = TerminalView(model)
+    controller = TerminalController(model, view)
+    view.set_controller(controller)
+    app = TerminalApp(screen, controller, view, meter)
+    app.run()
+    return app.get_report()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Minesweeper in the terminal")
+    parser.add_argument('--difficulty', default=Difficulty.DEFAULT.value,
+                        choices=[difficulty.value for difficulty in Difficulty if difficulty != Difficulty.CUSTOM])
+    parser.add_argument('--height', type=int)
+    parser.add_argument('--width', type=int)
+    parser.add_argument('--bombs', type=int)
+    parser.add_argument('--report',
+                        help="Path to write frame time, characters drawn and bytes sent to the terminal per move to as JSON")
+    args = parser.parse_args()
+
+    difficulty = Difficulty(args.difficulty)
+    custom = ()
+    if args.height or args.width or args.bombs:
+        difficulty = Difficulty.CUSTOM
+        custom = (args.height or 20, args.width or 20, args.bombs or 60)
+    # Bytes can only be counted in between curses and a real terminal
+    meter = OutputMeter() if os.isatty(0) and os.isatty(1) else None
+    if meter is not None:
+        meter.start()
+    try:
+        report = curses.wrapper(main, difficulty, custom, meter)
+    finally:
+        if meter is not None:
+            meter.stop()
+    print(json.dumps(report))
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
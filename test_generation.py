@@ -0,0 +1,37 @@
+"""
+Tests of the parallel generation of bombs layouts: the layout of a seed doesn't depend on the
+number of processes, and its counts are the bombs around every square.
+
+    python -m pytest test_generation.py
+"""
+import pytest
+
+from generation import generate_layout, get_bands
+
+# Board sizes as (height, width, bombs), split into many bands by BAND_CELLS
+BOARDS = [(40, 30, 200), (97, 13, 600), (25, 64, 1)]
+BAND_CELLS = 100
+SEEDS = range(5)
+
+
+@pytest.mark.parametrize('height, width, bombs', BOARDS)
+@pytest.mark.parametrize('seed', SEEDS)
+def test_same_layout_whatever_the_workers(height: int, width: int, bombs: int, seed: int) -> None:
+    assert len(get_bands(height, width, BAND_CELLS)) > 4
+    reference = generate_layout(height, width, bombs, seed, workers=1, band_cells=BAND_CELLS)
+    for workers in (2, 4):
+        layout = generate_layout(height, width, bombs, seed, workers=workers, band_cells=BAND_CELLS)
+        assert layout.mines == reference.mines
+        assert layout.counts == reference.counts
+
+
+@pytest.mark.parametrize('height, width, bombs', BOARDS)
+def test_counts_are_the_bombs_around(height: int, width: int, bombs: int) -> None:
+    layout = generate_layout(height, width, bombs, 0, workers=1, band_cells=BAND_CELLS)
+    assert sum(layout.mines) == bombs
+    for i in range(height):
+        for j in range(width):
+            around = sum(layout.mines[i2 * width + j2]
+                         for i2 in range(max(0, i - 1), min(height, i + 2))
+                         for j2 in range(max(0, j - 1), min(width, j + 2)))
+            assert layout.counts[i * width + j] == around
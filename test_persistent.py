@@ -0,0 +1,114 @@
+"""
+Property tests of the persistent board state: random writes, snapshots, branches and restores
+are checked against a plain dictionary of the squares, on seeded runs.
+
+    python -m pytest test_persistent.py
+"""
+import random
+
+import pytest
+
+from persistent import FLAGGED, REVEALED, TILE, BoardSnapshot, PersistentBoard
+
+# Board sizes as (height, width): smaller than a tile, exact tiles and partial edge tiles
+SIZES = [(1, 1), (5, 7), (TILE, TILE), (2 * TILE + 3, TILE + 1), (40, 70)]
+SEEDS = range(20)
+VALUES = (0, REVEALED, FLAGGED, REVEALED | FLAGGED)
+
+
+def _random_writes(rng: random.Random, board: PersistentBoard, expected: dict, count: int) -> None:
+    """ Write random values to random squares of a board and of its expected dictionary """
+    for _ in range(count):
+        i, j = rng.randrange(board.height), rng.randrange(board.width)
+        value = rng.choice(VALUES)
+        board.set(i, j, value)
+        expected[i, j] = value
+
+
+def _values(snapshot: BoardSnapshot) -> dict:
+    return {(i, j): snapshot.get(i, j) for i in range(snapshot.height) for j in range(snapshot.width)}
+
+
+def _diff(before: dict, after: dict) -> set:
+    return {(i, j, before.get((i, j), 0), after.get((i, j), 0))
+            for (i, j) in set(before) | set(after) if before.get((i, j), 0) != after.get((i, j), 0)}
+
+
+@pytest.mark.parametrize('height, width', SIZES)
+@pytest.mark.parametrize('seed', SEEDS)
+def test_snapshots_keep_their_values(height: int, width: int, seed: int) -> None:
+    rng = random.Random(seed)
+    board = PersistentBoard(height, width)
+    expected = {}
+    snapshots = []
+    for _ in range(10):
+        _random_writes(rng, board, expected, rng.randrange(30))
+        snapshots.append((board.snapshot(), dict(expected)))
+    assert _values(board) == {**_values(BoardSnapshot(height, width)), **expected}
+    for snapshot, values in snapshots:
+        assert _values(snapshot) == {**_values(BoardSnapshot(height, width)), **values}
+
+
+@pytest.mark.parametrize('height, width', SIZES)
+@pytest.mark.parametrize('seed', SEEDS)
+def test_changed_cells_is_the_difference(height: int, width: int, seed: int) -> None:
+    rng = random.Random(seed)
+    board = PersistentBoard(height, width)
+    _random_writes(rng, board, {}, rng.randrange(50))
+    before = board.snapshot()
+    _random_writes(rng, board, {}, rng.randrange(50))
+    after = board.snapshot()
+    assert set(before.changed_cells(after)) == _diff(_values(before), _values(after))
+    assert set(after.changed_cells(before)) == _diff(_values(after), _values(before))
+    assert not list(after.changed_cells(after))
+
+
+@pytest.mark.parametrize('height, width', SIZES)
+@pytest.mark.parametrize('seed', SEEDS)
+def test_branches_are_independent(height: int, width: int, seed: int) -> None:
+    rng = random.Random(seed)
+    board = PersistentBoard(height, width)
+    expected = {}
+    _random_writes(rng, board, expected, rng.randrange(50))
+    root = board.snapshot()
+    root_values = _values(root)
+    branches = []
+    for _ in range(4):
+        branch = root.branch()
+        branch_expected = dict(expected)
+        _random_writes(rng, branch, branch_expected, rng.randrange(50))
+        branches.append((branch, branch_expected))
+    # Writes after the branches were made don't reach them, nor the snapshot they come from
+    _random_writes(rng, board, expected, rng.randrange(50))
+    assert _values(root) == root_values
+    for branch, branch_expected in branches:
+        assert _values(branch) == {**root_values, **branch_expected}
+        assert set(root.changed_cells(branch.snapshot())) == _diff(root_values, _values(branch))
+
+
+@pytest.mark.parametrize('height, width', SIZES)
+@pytest.mark.parametrize('seed', SEEDS)
+def test_restore_goes_back_to_a_snapshot(height: int, width: int, seed: int) -> None:
+    rng = random.Random(seed)
+    board = PersistentBoard(height, width)
+    _random_writes(rng, board, {}, rng.randrange(50))
+    saved = board.snapshot()
+    saved_values = _values(saved)
+    _random_writes(rng, board, {}, rng.randrange(1, 50))
+    board.restore(saved)
+    assert _values(board) == saved_values
+    # Writing after a restore copies the tiles again instead of changing the snapshot
+    _random_writes(rng, board, {}, rng.randrange(1, 50))
+    assert _values(saved) == saved_values
+
+
+@pytest.mark.parametrize('height, width', SIZES)
+@pytest.mark.parametrize('seed', SEEDS)
+def test_bytes_round_trip(height: int, width: int, seed: int) -> None:
+    rng = random.Random(seed)
+    board = PersistentBoard(height, width)
+    _random_writes(rng, board, {}, rng.randrange(50))
+    snapshot = board.snapshot()
+    copy = BoardSnapshot.from_bytes(height, width, snapshot.to_bytes())
+    assert _values(copy) == _values(snapshot)
+    assert not list(copy.changed_cells(snapshot))
@@ -0,0 +1,91 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from constants import DEFAULT_TRANSPOSITION_CACHE_SIZE
+
+
+class TranspositionCache:
+    """
+    Bounded LRU cache of analysis results, keyed by position.
+    Keys are usually Grid.get_position_key(), so a position reached again after an undo,
+    in a replay or in another game is analysed only once.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_TRANSPOSITION_CACHE_SIZE) -> None:
+        """
+        :param max_entries: Number of positions kept before the least recently used is dropped
+        """
+        if max_entries <= 0:
+            raise ValueError("Cache needs room for at least one entry")
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return the result stored for a position
+
+        :param key: Position key
+        :param default: Returned when the position isn't cached
+        :return: Cached result or default
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store the result of a position
+
+        :param key: Position key
+        :param value: Analysis result
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the result stored for a position, computing and storing it if missing
+
+        :param key: Position key
+        :param compute: Function computing the result
+        :return: Analysis result
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            value = compute()
+            self.put(key, value)
+            return value
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def clear(self) -> None:
+        """ Drop every entry, statistics are kept """
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get_hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get_stats(self) -> dict[str, Any]:
+        return {'entries': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions, 'hit_rate': self.get_hit_rate()}
@@ -1,10 +1,12 @@
 from dataclasses import dataclass
 from enum import Enum
 
+from persistent import BoardSnapshot
+
 
 @dataclass
 class BoardState:
-    grid_state: list[list[dict[str, bool]]]
+    grid_state: BoardSnapshot
     squares_revealed: int
     bombs_left: int
 
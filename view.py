@@ -1,20 +1,29 @@
+import os
 import tkinter as tk
 from tkinter import ttk, font, Button
 import tkinter.font as tkf
 import time
+from typing import Callable, Optional
 
+from constants import AUTOPLAY_MAX_SPEED_EXPONENT, BOARD_SQUARES_PER_STEP
 import utils
 
+# Images are loaded from next to the sources, whatever the working directory
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+
 
 class View:
 
     def __init__(self) -> None:
         self.window = None
         self.difficulty_cbox = None
+        self.undo_button = None
         self.controller = None
         self.game_frame = None
         self.board = None
-        self.flag = None
+        self.board_complete = False
+        self.first_paint_time = None
+        self.images = {}
         self.mine = None
         self.time = None
         self.difficulty_str = None
@@ -23,35 +32,69 @@ class View:
         """
         Creates main unresizable window
         """
+        self.create_window()
+        self.create_widgets()
+        return self.window
+
+    def create_window(self) -> tk.Tk:
+        """
+        Creates main unresizable window, empty, and paints it right away
+        """
         self.window = tk.Tk()
         self.window.title("Minesweeper")
         self.window["bg"] = "white"
         self.window.resizable(width=False, height=False)
+        self.window.update()
+        self.first_paint_time = time.time()
+        return self.window
+
+    def create_widgets(self, on_board_complete: Optional[Callable[[], None]] = None) -> None:
+        """
+        Draw the top menu frame, then the board progressively so the window stays responsive
+
+        :param on_board_complete: Called once every square of the board is created
+        """
         self.create_images()
-        self.create_board(self.window)
         self.create_top_frame(self.window)
-        return self.window
+        self.create_board(self.window, progressive=True, on_complete=on_board_complete)
 
     def set_controller(self, controller) -> None:
         self.controller = controller
 
     def create_images(self) -> None:
         """
-        Load game related images
+        Load game related images shown from the start, others are loaded on first use
+        """
+        self.mine = self.get_image("mine")
+        self.time = self.get_image("time")
+
+    def get_image(self, name: str) -> tk.PhotoImage:
+        """
+        Return a game related image, loading it on first use
+
+        :param name: Name of the image file, without extension
+        :return: The loaded image
         """
-        self.flag = tk.PhotoImage(file="images/red_flag.gif")
-        self.mine = tk.PhotoImage(file="images/mine.gif")
-        self.time = tk.PhotoImage(file="images/time.gif")
+        if name not in self.images:
+            self.images[name] = tk.PhotoImage(file=os.path.join(IMAGES_DIR, f"{name}.gif"))
+        return self.images[name]
 
-    def create_board(self, window: tk.Tk) -> list[list[Button]]:
+    def create_board(self, window: tk.Tk, progressive: bool = False,
+                     on_complete: Optional[Callable[[], None]] = None) -> list[list[Button]]:
         """
         Create main game frame
 
         :param window: Main window to draw upon
-        :return: Board which is a list of list of buttons
+        :param progressive: Whether to create a few rows at a time, letting Tk paint in between
+        :param on_complete: Called once every square is created
+        :return: Board which is a list of list of buttons, filled row by row when progressive
         """
         self.game_frame = tk.Frame(window, borderwidth=2, relief=tk.SUNKEN)
+        game_frame = self.game_frame
         my_font = font.Font(family='fixedsys', size=18)
+        height = self.controller.get_board_height()
+        width = self.controller.get_board_width()
+        rows_per_step = max(1, BOARD_SQUARES_PER_STEP // width) if progressive else height
 
         def create_square(i: int, j: int) -> tk.Button:
             """
@@ -61,13 +104,19 @@ class View:
             :param j: Width location of the cell
             :return: tkinter Button as cell
             """
-            frame = tk.Frame(self.game_frame, height=30, width=30)
+            frame = tk.Frame(game_frame, height=30, width=30)
             cell = tk.Button(frame, borderwidth=2, state="normal", font=my_font, highlightthickness=10)
             cell.pack(fill=tk.BOTH, expand=True)
 
             # buttons bindings
             def __handler(event, x=i, y=j):
-                if event.num == 1:
+                # A move could reach squares which aren't created yet
+                if not self.board_complete:
+                    return
+                if event.num == 2 or (event.num == 1 and self.controller.is_square_revealed(x, y)):
+                    # Clicking a revealed number chords, it doesn't reveal anything otherwise
+                    self.controller.chord_handler(x, y)
+                elif event.num == 1:
                     self.controller.left_handler(x, y)
                 elif event.num == 3:
                     self.controller.right_handler(x, y)
@@ -75,15 +124,33 @@ class View:
                     raise Exception('Invalid event code.')
 
             cell.bind("<Button-1>", __handler)
+            cell.bind("<Button-2>", __handler)
             cell.bind("<Button-3>", __handler)
 
             frame.pack_propagate(False)
             frame.grid(row=i, column=j)
             return cell
 
-        self.board = [[create_square(i, j) for j in range(self.controller.get_board_width())]
-                      for i in range(self.controller.get_board_height())]
+        def _create_rows() -> None:
+            """
+            Helper function to create the next rows of the board
+            """
+            if game_frame is not self.game_frame:
+                # Board was replaced before it was complete
+                return
+            for i in range(len(self.board), min(len(self.board) + rows_per_step, height)):
+                self.board.append([create_square(i, j) for j in range(width)])
+            if len(self.board) < height:
+                window.after(1, _create_rows)
+            else:
+                self.board_complete = True
+                if on_complete is not None:
+                    on_complete()
+
+        self.board = []
+        self.board_complete = False
         self.game_frame.pack(padx=10, pady=10, side=tk.BOTTOM)
+        _create_rows()
         return self.board
 
     # Top frame ####################################################################
@@ -140,10 +207,10 @@ class View:
 
         def _update_undo_button() -> None:
             if not self.controller.undo_button_enabled():
-                undo_button['state'] = 'disabled'
+                self.undo_button['state'] = 'disabled'
             else:
-                undo_button['state'] = 'normal'
-            undo_button.after(100, _update_undo_button)
+                self.undo_button['state'] = 'normal'
+            self.undo_button.after(100, _update_undo_button)
 
         def _update_undo_remaining() -> None:
             """
@@ -158,12 +225,12 @@ class View:
             self.controller.undo_state()
 
         memento_frame = tk.Frame(top_frame, borderwidth=2, height=40, relief=tk.GROOVE, padx=2)
-        undo_button = tk.Button(memento_frame, bd=1, width=5, text="Undo", command=_undo)
+        self.undo_button = tk.Button(memento_frame, bd=1, width=5, text="Undo", command=_undo)
         undo_remaining_label = tk.Label(memento_frame, height=1, width=3, bg='white',
                                         textvariable=undo_remaining_str,
                                         font=tkf.Font(weight='bold', size=10))
         _update_undo_button()
-        undo_button.grid(row=0, column=0, padx=0)
+        self.undo_button.grid(row=0, column=0, padx=0)
         undo_remaining_label.grid(row=0, column=1, padx=0)
         memento_frame.grid(row=0, column=1, padx=5)
 
@@ -294,7 +361,7 @@ class View:
         :param i: Height location of the cell
         :param j: Width location of the cell
         """
-        self.board[i][j]["image"] = self.flag
+        self.board[i][j]["image"] = self.get_image("red_flag")
         self.board[i][j]["state"] = "normal"
 
     def set_disabled(self, i: int, j: int) -> None:
@@ -314,6 +381,9 @@ class View:
         :param height: Height of entire board
         :param width: Width of entire board
         """
+        if not self.board_complete:
+            # No move was possible yet, the squares are still untouched
+            return
         for x in range(height):
             for y in range(width):
                 self.set_unclicked(x, y)
@@ -326,13 +396,87 @@ class View:
         """
         for i in range(self.controller.get_board_height()):
             for j in range(self.controller.get_board_width()):
-                if not grid_state.grid_state[i][j]['is_revealed']:
+                if not grid_state.grid_state.is_revealed(i, j):
                     self.set_unclicked(i, j)
-                if grid_state.grid_state[i][j]['is_flagged']:
+                if grid_state.grid_state.is_flagged(i, j):
                     self.set_flag(i, j)
                 else:
                     self.set_disabled(i, j)
 
+    def create_debug_overlay(self, profiler) -> None:
+        """
+        Draw a window showing live profiling data
+
+        :param profiler: instrument.Profiler to show the data of
+        """
+        overlay = tk.Toplevel(self.window)
+        overlay.title("Minesweeper - debug")
+        overlay_str = tk.StringVar()
+
+        def _update_overlay() -> None:
+            """
+            Helper function to update profiling data periodically
+            """
+            overlay_str.set("\n".join(profiler.summary_lines()))
+            overlay.after(500, _update_overlay)
+
+        _update_overlay()
+
+        overlay_label = tk.Label(overlay, textvariable=overlay_str, justify=tk.LEFT, anchor=tk.NW,
+                                 font=tkf.Font(family='courier', size=9))
+        overlay_label.pack(padx=5, pady=5, fill=tk.BOTH, expand=True)
+
+    def create_autoplay_controls(self, player) -> None:
+        """
+        Draw a window controlling autoplay: speed slider, pause and step buttons, and status
+
+        :param player: autoplay.Autoplayer to control
+        """
+        controls = tk.Toplevel(self.window)
+        controls.title("Minesweeper - autoplay")
+        speed_str = tk.StringVar()
+        status_str = tk.StringVar()
+        # Slider values are powers of ten of the speed, so both slow and full speed are reachable
+        exponent = tk.DoubleVar(value=1)
+
+        def _set_speed(*_) -> None:
+            speed = 10 ** exponent.get()
+            player.set_speed(speed)
+            speed_str.set(f"{speed:.0f} moves/s")
+
+        def _toggle_pause() -> None:
+            paused = player.toggle_pause()
+            pause_button["text"] = "Resume" if paused else "Pause"
+            step_button["state"] = "normal" if paused else "disabled"
+
+        def _update_status() -> None:
+            """
+            Helper function to update the status periodically
+            """
+            status_str.set(player.get_status())
+            controls.after(200, _update_status)
+
+        speed_scale = tk.Scale(controls, from_=0, to=AUTOPLAY_MAX_SPEED_EXPONENT, resolution=0.1,
+                               orient=tk.HORIZONTAL, showvalue=False, length=200, variable=exponent,
+                               command=_set_speed)
+        speed_scale.grid(row=0, column=0, columnspan=2, padx=5, pady=5)
+        tk.Label(controls, textvariable=speed_str, width=14).grid(row=0, column=2, padx=5)
+        pause_button = tk.Button(controls, text="Pause", width=8, command=_toggle_pause)
+        pause_button.grid(row=1, column=0, padx=5, pady=5)
+        step_button = tk.Button(controls, text="Step", width=8, state="disabled", command=player.step)
+        step_button.grid(row=1, column=1, padx=5, pady=5)
+        tk.Label(controls, textvariable=status_str, anchor=tk.W).grid(row=2, column=0, columnspan=3, padx=5,
+                                                                      pady=5, sticky=tk.W)
+        _set_speed()
+        _update_status()
+
+    def rebuild_board(self) -> None:
+        """
+        Build the board again at the size of the current game parameters, like a difficulty switch does
+        """
+        self.game_frame.destroy()
+        self.board = self.create_board(self.window)
+
     def set_cbox_value(self, value):
         """
         Set combobox value